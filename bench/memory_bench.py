@@ -0,0 +1,153 @@
+# memory_bench.py
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+# App keeps its settings, logs and output folders under the home directory, point it at a scratch one
+HOME = tempfile.mkdtemp(prefix="o2-bench-")
+os.environ['HOME'] = os.environ['USERPROFILE'] = HOME
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import eel  # noqa: E402
+from yt_dlp.utils import DownloadError  # noqa: E402
+
+from api import DownloaderAPI, compact_info  # noqa: E402
+from app import App  # noqa: E402
+
+MIB = 1024 * 1024
+
+# JavaScript functions the app calls through eel, there is no window to send them to
+EEL_FUNCTIONS = (
+    'updateDownloadList', 'setProgressBar', 'updateLogsTable', 'updateQueueItem', 'removeQueueItem',
+    'resetDownloadState', 'setQueueOrder', 'clearLogsTable', 'setQueueEta', 'confirmDuplicateDelete',
+)
+
+
+def synthetic_info(url):
+    """A yt-dlp-sized info dict, with the formats and headers a real extraction returns."""
+    n = url.rsplit('/', 1)[1]
+    headers = {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*', 'Accept-Language': 'en-us,en;q=0.5'}
+    formats = [{
+        'format_id': str(i),
+        'url': f"https://cdn{i % 4}.example.com/videoplayback?id={n}&itag={i}&sig={'x' * 200}",
+        'ext': 'mp4' if i % 2 else 'webm',
+        'filesize': (i + 1) * 1024 * 1024,
+        'http_headers': dict(headers),
+    } for i in range(40)]
+    return {
+        'id': f"v{n}",
+        'title': f"Synthetic video {n}",
+        'ext': 'mp4',
+        'format_id': '39',
+        'extractor_key': 'Generic',
+        'webpage_url': url,
+        'duration': 600,
+        'formats': formats,
+        'requested_formats': formats[-2:],
+        'http_headers': headers,
+        'description': 'd' * 2000,
+    }
+
+
+def extract_metadata(self, url, audio_only=False, quality='Best'):
+    return synthetic_info(url)
+
+
+def download_media(self, url, audio_only, quality, output_filename=None, progress_callback=None, info=None,
+                   progress_hooks=None):
+    """Stands in for the yt-dlp transfer, the progress hooks and result are shaped like the real ones."""
+    self.check_interrupted()
+    if '/fail/' in url:
+        raise DownloadError(f"ERROR: Unsupported URL: {url}")
+    n = int(url.rsplit('/', 1)[1])
+    # A bounded set of files with distinct sizes, so the dedup index stays the same size between rounds
+    filename = os.path.join(self.output_path, f"clip{n % 20}.mp4")
+    with open(filename, 'wb') as f:
+        f.write(b'\0' * (n % 20 + 1))
+    for hook in progress_hooks or []:
+        hook({'status': 'downloading', 'filename': filename, 'tmpfilename': filename + '.part',
+              'downloaded_bytes': 0, 'total_bytes': n % 20 + 1, 'speed': 1024.0})
+        hook({'status': 'finished', 'filename': filename, 'total_bytes': n % 20 + 1, 'elapsed': 0.001})
+    return {"success": True, "filename": filename, "info": compact_info(info or synthetic_info(url))}
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that running many jobs through the app does not grow memory.")
+    parser.add_argument('--jobs', type=int, default=1000, help="Jobs per round")
+    parser.add_argument('--rounds', type=int, default=3, help="Rounds after the warm-up round")
+    parser.add_argument('--fail-every', type=int, default=10, help="Every nth job fails, 0 for none")
+    parser.add_argument('--max-rss-growth', type=float, default=4.0, help="Allowed RSS growth after warm-up, in MiB")
+    parser.add_argument('--max-growth', type=float, default=1.0,
+                        help="Allowed traced memory growth after warm-up, in MiB")
+    args = parser.parse_args()
+
+    finished = threading.Semaphore(0)
+    for name in EEL_FUNCTIONS:
+        setattr(eel, name, lambda *a: None)
+    # The worker calls this last for every finished job
+    eel.resetDownloadState = finished.release
+    DownloaderAPI.extract_metadata = extract_metadata
+    DownloaderAPI.download_media = download_media
+
+    app = App()
+    next_id = iter(range(sys.maxsize))
+
+    def run():
+        for _ in range(args.jobs):
+            n = next(next_id)
+            failing = args.fail_every and n % args.fail_every == 0
+            app.add_to_queue(f"https://example{n % 50}.com/{'fail' if failing else 'watch'}/{n}", n % 3 == 0)
+        for _ in range(args.jobs):
+            if not finished.acquire(timeout=60):
+                sys.exit(f"jobs stopped finishing, {len(app.jobs)} left")
+        # Let the duplicate checks of the round finish too
+        app.dedup_index.submit(lambda: None).result()
+        gc.collect()
+
+    # The warm-up round fills the log history and lets allocator pools settle
+    run()
+    base_rss = rss_bytes()
+    for i in range(args.rounds):
+        run()
+        print(f"round {i + 1}: RSS {rss_bytes() / MIB:.1f} MiB")
+    rss_growth = (rss_bytes() - base_rss) / MIB
+
+    # tracemalloc has its own overhead, so it only runs once RSS has been measured
+    tracemalloc.start()
+    run()
+    base_traced = tracemalloc.get_traced_memory()[0]
+    for i in range(args.rounds):
+        run()
+        traced, peak = tracemalloc.get_traced_memory()
+        print(f"round {i + 1}: traced {traced / MIB:.2f} MiB (peak {peak / MIB:.2f} MiB)")
+    traced_growth = (tracemalloc.get_traced_memory()[0] - base_traced) / MIB
+    tracemalloc.stop()
+
+    print(f"growth after warm-up: RSS {rss_growth:.1f} MiB, traced {traced_growth:.2f} MiB")
+    assert not app.jobs and not len(app.job_queue) and not app.queue_eta.remaining_jobs(), "finished jobs were kept"
+    assert len(app.download_logs) <= int(app.settings['log_history']), "log history is not bounded"
+    assert rss_growth < args.max_rss_growth, f"RSS grew by {rss_growth:.1f} MiB"
+    assert traced_growth < args.max_growth, f"traced memory grew by {traced_growth:.2f} MiB"
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
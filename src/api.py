@@ -1,14 +1,66 @@
 # api.py
 
+import glob
 import os
+import threading
 import yt_dlp
-from typing import Dict, Any, Callable
-from world import get_config_path
+from typing import Dict, Any, Callable, List
+from yt_dlp.networking import Request
+from yt_dlp.postprocessor import get_postprocessor
+from yt_dlp.utils import DownloadCancelled, Popen
+from assets import PlaceAssetsPP
+from retry import NETWORK, classify_error
+from world import get_config_path, get_domain_from_url
+
+# Longest post-processing waits for a thumbnail or subtitles still loading once the media is downloaded
+ASSET_WAIT = 30.0
+
+# DownloaderAPI instances currently downloading, by thread
+_active_downloads = {}
+_tracking_lock = threading.Lock()
+_tracking_installed = False
+
+# How an interrupted download is reported, by interrupt reason
+INTERRUPTED = {'cancel': "cancelled", 'pause': "paused"}
+
+
+def install_process_tracking():
+    """Make yt-dlp report the FFmpeg processes it starts, so a cancel can kill them. Safe to call repeatedly.
+
+    yt-dlp has no hook for this. It launches FFmpeg and external downloaders through its own
+    yt_dlp.utils.Popen subclass (checked against yt-dlp 2026.08.19), so that class's __init__ is wrapped.
+    subprocess.Popen itself is left alone, and processes started on threads that are not running
+    a download pass through untouched.
+    """
+    global _tracking_installed
+    with _tracking_lock:
+        if _tracking_installed:
+            return
+        popen_init = Popen.__init__
+
+        def tracked_init(self, *args, **kwargs):
+            popen_init(self, *args, **kwargs)
+            # yt-dlp starts FFmpeg on the downloading thread
+            owner = _active_downloads.get(threading.get_ident())
+            if owner is not None:
+                owner.processes.add(self)
+                if owner.interrupted:
+                    self.kill()
+
+        Popen.__init__ = tracked_init
+        _tracking_installed = True
+
+
+class JobInterrupted(DownloadCancelled):
+    pass
 
 
 class DownloaderAPI:
     def __init__(self):
         self.output_path = None
+        self.interrupted = None  # 'cancel' or 'pause' once asked to stop
+        self.processes = set()
+        self.partial_files = set()
         self.video_format = "auto"  # 'auto', 'mp4', 'mov', 'webm', etc.
         self.audio_format = "auto"  # 'auto', 'mp3', 'wav', 'aac', etc.
         self.options = {
@@ -19,9 +71,11 @@ class DownloaderAPI:
             'segments': 4,
             'retries': 5,
             'buffer_size': '16M',
+            'rate_limit': None,
             'cachedir': str(get_config_path() / "cache")
         }
         self.auth_options = {}
+        self.asset_cache = None
 
     def set_output_path(self, path):
         self.output_path = path
@@ -35,6 +89,9 @@ class DownloaderAPI:
             if key in self.options:
                 self.options[key] = value
 
+    def set_asset_cache(self, asset_cache):
+        self.asset_cache = asset_cache
+
     def set_cookie_file(self, cookie_file):
         self.auth_options['cookiefile'] = cookie_file
         self.auth_options.pop('username', None)
@@ -48,6 +105,21 @@ class DownloaderAPI:
     def clear_auth_options(self):
         self.auth_options = {}
 
+    def interrupt(self, reason: str):
+        """Stop a running download as soon as possible, killing any FFmpeg it started."""
+        self.interrupted = reason
+        for process in list(self.processes):
+            if process.poll() is None:
+                process.kill()
+
+    def remove_partial_files(self):
+        remove_partial_files(self.partial_files)
+        self.partial_files.clear()
+
+    def check_interrupted(self, *args):
+        if self.interrupted:
+            raise JobInterrupted(f"Download {INTERRUPTED[self.interrupted]}")
+
     def parse_size(self, size_str: str) -> int:
         """Parse a size string (e.g., '16M') and return the size in bytes."""
         try:
@@ -67,13 +139,12 @@ class DownloaderAPI:
         """Validate buffer size input. Returns True if valid, False otherwise."""
         return self.parse_size(buffer_size) is not None
 
-    def download_media(
+    def build_ydl_opts(
             self,
-            url: str,
             audio_only: bool = False,
             quality: str = 'Best',
             output_filename: str = None,
-            progress_callback: Callable[[float, str], None] = None
+            progress_hooks: List[Callable[[Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         quality_map = {
             'Best': '',
@@ -104,35 +175,31 @@ class DownloaderAPI:
         if output_filename:
             outtmpl = os.path.join(self.output_path, output_filename)
 
-        def progress_hook(d):
-            if d.get('status') == 'downloading':
-                total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-                downloaded_bytes = d.get('downloaded_bytes', 0)
-                progress = downloaded_bytes / total_bytes if total_bytes else 0
-                filename = d.get('filename', 'Unknown')
-                if progress_callback:
-                    progress_callback(progress, filename)
-
         # Parse size options
         buffersize = self.parse_size(self.options['buffer_size'])
         buffersize = buffersize if buffersize else None
+        ratelimit = self.parse_size(self.options['rate_limit']) if self.options['rate_limit'] else None
 
         ydl_opts = {
             'format': format_spec,
             'outtmpl': outtmpl,
             'quiet': True,
             'no_warnings': True,
-            'progress_hooks': [progress_hook],
+            'progress_hooks': list(progress_hooks or []),
             'noplaylist': True,
             'proxy': self.options['proxy'],
             'writesubtitles': bool(self.options['sublangs']),
             'subtitleslangs': self.options['sublangs'].split(',') if self.options['sublangs'] else None,
-            'writethumbnail': self.options['write_thumbnail'],
+            # EmbedThumbnail needs the thumbnail on disk, it removes it again unless write_thumbnail is set
+            'writethumbnail': self.options['write_thumbnail'] or self.embeds_thumbnail(audio_only),
             'embedthumbnail': self.options['embed_thumbnail'],
             'cachedir': self.options['cachedir'],
-            'retries': int(self.options['retries']),
+            # Whole-job retries are scheduled by the queue, only retry fragments in place
+            'retries': 1,
+            'extractor_retries': 1,
             'fragment_retries': int(self.options['retries']),
             'buffersize': buffersize,
+            'ratelimit': ratelimit or None,
             'merge_output_format': 'mp4' if not audio_only else None,
             'concurrent_fragment_downloads': int(self.options['segments']),
         }
@@ -148,18 +215,193 @@ class DownloaderAPI:
                 'preferredcodec': self.audio_format,
                 'preferredquality': '192',
             })
-            if self.options['embed_thumbnail']:
-                ydl_opts['postprocessors'].append({'key': 'EmbedThumbnail'})
+            if self.embeds_thumbnail(audio_only):
+                ydl_opts['postprocessors'].append({
+                    'key': 'EmbedThumbnail',
+                    'already_have_thumbnail': self.options['write_thumbnail'],
+                })
+
+        return ydl_opts
+
+    def extract_metadata(self, url: str, audio_only: bool = False, quality: str = 'Best') -> Dict[str, Any]:
+        """Resolve metadata and format selection for a URL without downloading it."""
+        ydl_opts = self.build_ydl_opts(audio_only, quality)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    def embeds_thumbnail(self, audio_only: bool) -> bool:
+        # Thumbnails are only embedded into converted audio
+        return bool(audio_only and self.audio_format != 'auto' and self.options['embed_thumbnail'])
+
+    def wanted_assets(self, audio_only: bool = False):
+        """(thumbnail, convert_thumbnail, subtitles) a download with the current options writes."""
+        return (
+            self.options['write_thumbnail'] or self.embeds_thumbnail(audio_only),
+            self.embeds_thumbnail(audio_only),
+            bool(self.options['sublangs'])
+        )
+
+    def asset_opener(self):
+        """Fetch function for thumbnails and subtitles going through the same proxy and auth as the media."""
+        ydl_opts = {'quiet': True, 'no_warnings': True, 'proxy': self.options['proxy']}
+        ydl_opts.update(self.auth_options)
+
+        def opener(url, headers):
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                with ydl.urlopen(Request(url, headers=headers)) as response:
+                    return response.read()
+        return opener
+
+    def prefetch_assets(self, info: Dict[str, Any], audio_only: bool = False):
+        """Start fetching the thumbnail and subtitles for resolved metadata into the asset cache."""
+        if self.asset_cache and any(self.wanted_assets(audio_only)):
+            self.asset_cache.prepare(info, self.asset_opener(), *self.wanted_assets(audio_only))
 
+    def download_media(
+            self,
+            url: str,
+            audio_only: bool = False,
+            quality: str = 'Best',
+            output_filename: str = None,
+            progress_callback: Callable[[float, str], None] = None,
+            info: Dict[str, Any] = None,
+            progress_hooks: List[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        def progress_hook(d):
+            # Recorded before stopping, the file of the very first hook call is partial too
+            if d.get('tmpfilename'):
+                self.partial_files.add(d['tmpfilename'])
+            self.check_interrupted()
+            if d.get('status') == 'downloading':
+                total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
+                downloaded_bytes = d.get('downloaded_bytes', 0)
+                progress = downloaded_bytes / total_bytes if total_bytes else 0
+                filename = d.get('filename', 'Unknown')
+                if progress_callback:
+                    progress_callback(progress, filename)
+
+        ydl_opts = self.build_ydl_opts(audio_only, quality, output_filename, [progress_hook] + list(progress_hooks or []))
+        ydl_opts['postprocessor_hooks'] = [self.check_interrupted]
+        # Added by hand below, so asset placement can run ahead of them
+        postprocessors = ydl_opts.pop('postprocessors', [])
+
+        install_process_tracking()
+        _active_downloads[threading.get_ident()] = self
         try:
+            self.check_interrupted()
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                use_assets = self.asset_cache and any(self.wanted_assets(audio_only))
+                if info is None and use_assets:
+                    # Resolve first so cached assets can be put in place before the download
+                    info = ydl.extract_info(url, download=False)
+                pending = {}
+                if use_assets:
+                    pending = self.asset_cache.apply(info, self.asset_opener(), *self.wanted_assets(audio_only))
+                if pending:
+                    # Assets still loading are written after the transfer instead of holding it up
+                    ydl.add_post_processor(PlaceAssetsPP(ydl, pending, ASSET_WAIT), when='post_process')
+                for pp_def in postprocessors:
+                    # Same as YoutubeDL does with the postprocessors option
+                    pp_def = dict(pp_def)
+                    when = pp_def.pop('when', 'post_process')
+                    ydl.add_post_processor(get_postprocessor(pp_def.pop('key'))(ydl, **pp_def), when=when)
+                if info:
+                    # Metadata was resolved ahead of time, skip extraction
+                    info = ydl.process_ie_result(info, download=True)
+                else:
+                    info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
-                return {"success": True, "filename": filename, "info": info}
+                # The full info dict holds every format and header, only hand back what callers use
+                return {"success": True, "filename": filename, "info": compact_info(info)}
         except Exception as e:
             # Remove partial file if exists
             if 'filename' in locals():
                 partial_file = filename
                 if partial_file and os.path.exists(partial_file):
                     os.remove(partial_file)
-            return {"success": False, "error": str(e)}
+            # exc is for log_error's traceback, it is not kept past the job
+            return {"success": False, "error": str(e), "error_class": classify_error(e), "exc": e}
+        finally:
+            _active_downloads.pop(threading.get_ident(), None)
+            self.processes.clear()
+
+
+COMPACT_INFO_KEYS = ('id', 'title', 'ext', 'format_id', 'extractor_key', 'webpage_url', 'duration')
+
+
+def create_api(url, settings, auth_manager, output_path, proxy=None, asset_cache=None, rate_limit=None):
+    """Build a DownloaderAPI configured from download settings and the auth for the URL's domain."""
+    api = DownloaderAPI()
+
+    # ドメインを取得
+    domain = get_domain_from_url(url)
+
+    # 認証情報を確認
+    cookie_file = auth_manager.get_cookie_file(domain)
+    credentials = auth_manager.get_credentials(domain)
+
+    if cookie_file:
+        api.set_cookie_file(cookie_file)
+    elif credentials:
+        api.set_credentials(credentials['username'], credentials['password'])
+
+    api.set_output_path(output_path)
+    api.set_formats(settings['video_format'], settings['audio_format'])
+    api.set_options(
+        proxy=proxy,
+        sublangs=settings['sublangs'],
+        write_thumbnail=settings['write_thumbnail'],
+        embed_thumbnail=settings['embed_thumbnail'],
+        segments=settings['segments'],
+        retries=settings['retries'],
+        buffer_size=settings['buffer_size'],
+        rate_limit=rate_limit
+    )
+    api.set_asset_cache(asset_cache)
+    return api
+
+
+def release_proxy(proxy_pool, proxy, result, seconds):
+    """Report a download_media result to the proxy pool, with its throughput when it succeeded."""
+    if result["success"]:
+        filename = result["filename"]
+        nbytes = os.path.getsize(filename) if os.path.exists(filename) else 0
+        proxy_pool.release(proxy, True, nbytes, seconds)
+    else:
+        # Only connection problems say something about the proxy itself
+        proxy_pool.release(proxy, result["error_class"] != NETWORK)
+
+
+def remove_partial_files(partial_files):
+    """Delete the .part files of an interrupted download, with the fragments and .ytdl state of fragmented ones."""
+    for partial_file in partial_files:
+        base = partial_file[:-len('.part')] if partial_file.endswith('.part') else partial_file
+        leftovers = [partial_file, base + '.ytdl'] + glob.glob(glob.escape(partial_file) + '-Frag*')
+        for path in leftovers:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def compact_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a yt-dlp info dict to the handful of fields kept after a download."""
+    compact = {key: info.get(key) for key in COMPACT_INFO_KEYS}
+    compact['filesize'] = estimate_filesize(info)
+    # Where the file ended up after merging and post-processing
+    compact['filepath'] = next((d.get('filepath') for d in info.get('requested_downloads') or []), None)
+    return compact
+
+
+def estimate_filesize(info: Dict[str, Any]) -> int:
+    """Estimate the download size in bytes from resolved metadata, or None if unknown."""
+    if not info:
+        return None
+    formats = info.get('requested_formats') or [info]
+    total = 0
+    for f in formats:
+        size = f.get('filesize') or f.get('filesize_approx')
+        if not size:
+            return None
+        total += size
+    return int(total)
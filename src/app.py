@@ -2,17 +2,74 @@
 
 import json
 import os
-import queue
+import shutil
 import subprocess
 import sys
 import threading
+import time
+from collections import deque
 from datetime import datetime
 
 import eel
 
-from api import DownloaderAPI
+from api import DownloaderAPI, create_api, estimate_filesize, release_proxy, remove_partial_files
+from assets import AssetCache, DEFAULT_MAX_BYTES
 from auth import AuthManager
-from world import get_default_output_path, get_config_path, get_domain_from_url
+from cluster import FileJobStore
+from dedup import ACTIONS, DedupIndex
+from eta import QueueEta, ThroughputHistory
+from jobs import Job, JobQueue
+from prefetch import Prefetcher
+from proxy import ProxyPool, parse_affinity, parse_proxies
+from retry import DomainCooldown, NETWORK, RATE_LIMITED, backoff_delay, classify_error, is_transient
+from storage import DiskBudget, InsufficientSpaceError, Mover
+from world import get_default_output_path, get_config_path, get_domain_from_url, log_error
+
+MIB = 1024 * 1024
+
+# How often the coordinator looks for finished and abandoned cluster jobs
+CLUSTER_POLL_INTERVAL = 2.0
+
+
+def default_settings():
+    return {
+        # Video Settings
+        'video_quality': 'Best',
+        'video_format': 'auto',
+        'video_output_path': get_default_output_path(for_audio=False),
+
+        # Audio Settings
+        'audio_format': 'auto',
+        'audio_output_path': get_default_output_path(for_audio=True),
+
+        # Other Settings
+        'proxy': None,
+        'proxy_affinity': None,
+        'proxy_probe_url': 'https://www.gstatic.com/generate_204',
+        'sublangs': None,
+        'write_thumbnail': False,
+        'embed_thumbnail': False,
+
+        # Additional Settings
+        'segments': 4,
+        'retries': 5,
+        'buffer_size': '16M',
+
+        # Queue Settings
+        'prefetch_count': 3,
+        'prefetch_ttl': 300,
+        'log_history': 500,
+        'concurrent_downloads': 1,
+
+        # Cluster Settings
+        'cluster_store': None,
+
+        # Output Settings
+        'staging_path': None,
+        'mover_workers': 2,
+        'asset_cache_size': '256M',
+        'dedup_action': 'keep'
+    }
 
 
 class App:
@@ -20,36 +77,50 @@ class App:
         self.api = DownloaderAPI()
         self.auth_manager = AuthManager()
 
-        self.download_queue = queue.Queue()
-        self.worker_thread = threading.Thread(target=self.download_worker, daemon=True)
-        self.worker_thread.start()
-
-        self.download_logs = []
-
-        self.settings = {
-            # Video Settings
-            'video_quality': 'Best',
-            'video_format': 'auto',
-            'video_output_path': get_default_output_path(for_audio=False),
-
-            # Audio Settings
-            'audio_format': 'auto',
-            'audio_output_path': get_default_output_path(for_audio=True),
-
-            # Other Settings
-            'proxy': None,
-            'sublangs': None,
-            'write_thumbnail': False,
-            'embed_thumbnail': False,
-
-            # Additional Settings
-            'segments': 4,
-            'retries': 5,
-            'buffer_size': '16M'
-        }
+        self.settings = default_settings()
 
         self.load_settings_from_file()
 
+        # Only a window of recent entries is kept in memory, the rest lives in the log files
+        self.download_logs = deque(maxlen=int(self.settings['log_history']))
+        self.log_file = get_config_path() / "logs" / f"O2-{datetime.now().strftime('%Y%m%d-%H%M%S')}.log"
+
+        self.proxy_pool = ProxyPool(
+            probe_url=self.settings['proxy_probe_url'],
+            on_event=lambda message: eel.updateDownloadList(message)
+        )
+        self.proxy_pool.set_proxies(parse_proxies(self.settings['proxy']))
+        self.proxy_pool.set_affinity(parse_affinity(self.settings['proxy_affinity']))
+
+        self.queue_eta = QueueEta(ThroughputHistory())
+        self.last_eta_push = 0.0
+
+        self.jobs = {}
+        self.cooldown = DomainCooldown()
+        self.job_queue = JobQueue(cooldown=self.cooldown)
+        self.prefetcher = Prefetcher(
+            self.job_queue,
+            self.resolve_job,
+            on_resolved=self.on_job_resolved,
+            lookahead=int(self.settings['prefetch_count']),
+            ttl=int(self.settings['prefetch_ttl'])
+        )
+        self.running = {}
+        self.disk_budget = DiskBudget()
+        self.mover = Mover(workers=int(self.settings['mover_workers']))
+        self.asset_cache = AssetCache(
+            os.path.join(self.api.options['cachedir'], "assets"),
+            max_bytes=self.api.parse_size(self.settings['asset_cache_size']) or DEFAULT_MAX_BYTES
+        )
+        self.capacity = threading.Condition()
+        self.dedup_index = DedupIndex()
+        self.index_output_folders()
+        self.worker_threads = []
+        self.start_workers()
+
+        self.cluster_store = FileJobStore(self.settings['cluster_store']) if self.settings['cluster_store'] else None
+        threading.Thread(target=self.collect_cluster_results, daemon=True).start()
+
     def load_settings(self):
         return self.settings
 
@@ -58,7 +129,19 @@ class App:
             eel.updateDownloadList("Please enter a URL.")
             return
 
-        self.download_queue.put((url, audio_only))
+        if self.cluster_store:
+            # Workers pick the job up from the shared store, results come back through collect_cluster_results
+            self.cluster_store.submit(url, audio_only, self.settings)
+            eel.updateDownloadList(f"Submitted to cluster: {url}")
+            return
+
+        job = Job(url, audio_only)
+        self.jobs[job.id] = job
+        self.job_queue.put(job)
+        self.queue_eta.set_queued(job.id, job.domain, self.get_format_key(job))
+        self.push_eta()
+        self.prefetcher.notify()
+        eel.updateQueueItem(job.to_dict())
         eel.updateDownloadList(f"Added to queue: {url}")
 
     def browse_output(self, output_type):
@@ -74,6 +157,7 @@ class App:
             if path:
                 self.settings[f'{output_type}_output_path'] = path
                 self.save_settings_to_file()
+                self.index_output_folders()
                 eel.set_browse_output(output_type, path)
             else:
                 eel.set_browse_output(output_type, None)
@@ -109,67 +193,258 @@ class App:
     def load_logs(self):
         logs_dir = get_config_path() / "logs"
         logs_dir.mkdir(parents=True, exist_ok=True)
-        log_files = sorted(logs_dir.glob("O2-*.log"), reverse=True)
+        log_files = sorted(logs_dir.glob("O2-*.log"))
         if not log_files:
             eel.updateDownloadList("No logs found.")
             return
-        self.download_logs = []
+        self.download_logs.clear()
         eel.clearLogsTable()
         for log_file in log_files:
             with open(log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-                self.download_logs.extend(logs)
-                for log_entry in logs:
-                    eel.updateLogsTable(log_entry)
+                if f.read(1) == '[':
+                    # Older versions wrote the whole history as one JSON list
+                    f.seek(0)
+                    self.download_logs.extend(json.load(f))
+                else:
+                    f.seek(0)
+                    self.download_logs.extend(json.loads(line) for line in f if line.strip())
+        for log_entry in self.download_logs:
+            eel.updateLogsTable(log_entry)
         eel.updateDownloadList(f"Loaded logs from {len(log_files)} file(s).")
 
-    def download_worker(self):
-        while True:
-            url, audio_only = self.download_queue.get()
-            self.current_audio_only = audio_only
-            eel.updateDownloadList(f"Downloading: {url}")
-            eel.setProgressBar(0.0)
-
-            # ドメインを取得
-            domain = get_domain_from_url(url)
+    def create_api(self, url, audio_only, proxy=None):
+        """Build a DownloaderAPI configured from the current settings and the auth for the URL's domain."""
+        return create_api(url, self.settings, self.auth_manager, self.get_output_path(audio_only), proxy,
+                          self.asset_cache)
+
+    def get_format_key(self, job):
+        if job.audio_only:
+            return f"audio:{self.settings['audio_format']}"
+        return f"video:{self.settings['video_format']}"
+
+    def on_job_resolved(self, job):
+        # The job may have started or finished since it was resolved, only a still queued job is refreshed
+        self.queue_eta.refresh_queued(job.id, job.domain, self.get_format_key(job), job.filesize)
+        self.push_eta()
+        eel.updateQueueItem(job.to_dict())
+
+    def push_eta(self, throttle=0.0):
+        now = time.monotonic()
+        if throttle and now - self.last_eta_push < throttle:
+            return
+        self.last_eta_push = now
+        eta = self.queue_eta.eta(int(self.settings['concurrent_downloads']))
+        eel.setQueueEta(eta, self.queue_eta.remaining_jobs())
 
-            # 認証情報を確認
-            cookie_file = self.auth_manager.get_cookie_file(domain)
-            credentials = self.auth_manager.get_credentials(domain)
+    def get_quality(self, audio_only):
+        # Not applicable for audio-only downloads
+        return None if audio_only else self.settings['video_quality']
 
-            if cookie_file:
-                self.api.set_cookie_file(cookie_file)
-            elif credentials:
-                self.api.set_credentials(credentials['username'], credentials['password'])
+    def resolve_job(self, job):
+        proxy = self.proxy_pool.acquire(job.domain)
+        try:
+            api = self.create_api(job.url, job.audio_only, proxy)
+            info = api.extract_metadata(job.url, job.audio_only, self.get_quality(job.audio_only))
+        except Exception as e:
+            # Only connection problems say something about the proxy itself
+            self.proxy_pool.release(proxy, classify_error(e) != NETWORK)
+            raise
+        self.proxy_pool.release(proxy, True)
+        job.info_proxy = proxy
+        # Thumbnail and subtitles download alongside whatever is transferring now
+        api.prefetch_assets(info, job.audio_only)
+        return info
+
+    def schedule_retry(self, job, error_class):
+        """Re-queue a transiently failed job behind other work. Returns False if it should fail for good."""
+        attempt = len(job.attempts)
+        if not is_transient(error_class) or attempt > int(self.settings['retries']):
+            return False
+
+        if error_class == RATE_LIMITED:
+            # Back off the whole domain, not just this job
+            self.cooldown.trigger(job.domain, backoff_delay(attempt, base=60.0, cap=1800.0))
+
+        delay = backoff_delay(attempt)
+        job.status = "retrying"
+        self.job_queue.put(job, delay)
+        self.queue_eta.remove(job.id)
+        self.queue_eta.set_queued(job.id, job.domain, self.get_format_key(job), job.filesize)
+        eel.updateQueueItem(job.to_dict())
+        eel.updateDownloadList(f"Retrying in {delay:.0f}s ({error_class}, attempt {attempt}): {job.url}")
+        return True
+
+    def get_output_path(self, audio_only):
+        return self.settings['audio_output_path'] if audio_only else self.settings['video_output_path']
+
+    def get_staging_dir(self, job):
+        if not self.settings['staging_path']:
+            return None
+        # One directory per job so retries resume from their own .part files
+        return os.path.join(self.settings['staging_path'], f"job-{job.uid}")
+
+    def reserve_space(self, job, info, download_path, output_path):
+        """Reserve space for the job where it downloads and, when staging, where it ends up."""
+        size = estimate_filesize(info)
+        if not size:
+            return []
+        # Merging and audio conversion briefly need the inputs and the output side by side
+        if len(info.get('requested_formats') or []) > 1 or (job.audio_only and self.settings['audio_format'] != 'auto'):
+            size *= 2
+        reservations = [self.disk_budget.reserve(download_path, size, preallocate=download_path != output_path)]
+        if download_path != output_path:
+            try:
+                reservations.append(self.disk_budget.reserve(output_path, size))
+            except InsufficientSpaceError:
+                reservations[0].release()
+                raise
+        return reservations
+
+    def run_job(self, job):
+        output_path = self.get_output_path(job.audio_only)
+        download_path = self.get_staging_dir(job) or output_path
+        quality = self.get_quality(job.audio_only)
+        # Transfer through the proxy that resolved the prefetched info, its media URLs may be tied to that IP
+        proxy = self.proxy_pool.acquire(job.domain, prefer=job.info_proxy if job.has_fresh_info() else None)
+        api = self.create_api(job.url, job.audio_only, proxy)
+        api.set_output_path(download_path)
+        self.running[job.id] = api
+        if job.control:
+            api.interrupt(job.control)
+        reservations = []
+
+        def progress_callback(progress, filename):
+            eel.updateDownloadList(f"Progress for {os.path.basename(filename)}: {progress:.2%}")
+            eel.setProgressBar(progress)
+
+        transfer = {"seconds": 0.0, "bytes": 0}
+
+        def eta_hook(d):
+            if d.get('status') == 'downloading':
+                total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
+                if total_bytes:
+                    self.queue_eta.sample(job.id, total_bytes - d.get('downloaded_bytes', 0), d.get('speed'))
+                    self.push_eta(throttle=1.0)
+            elif d.get('status') == 'finished':
+                transfer["seconds"] += d.get('elapsed') or 0.0
+                transfer["bytes"] += d.get('total_bytes') or d.get('downloaded_bytes') or 0
+
+        downloaded = {}
+
+        def reservation_hook(d):
+            if reservations and d.get('status') in ('downloading', 'finished'):
+                downloaded[d.get('filename')] = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+                reservations[0].update(sum(downloaded.values()))
+
+        started = time.monotonic()
+        try:
+            info = job.take_prefetched(proxy)
+            if info is None:
+                info = api.extract_metadata(job.url, job.audio_only, quality)
+                # Thumbnail and subtitles load while space is reserved and the media transfers
+                api.prefetch_assets(info, job.audio_only)
+            job.title = info.get('title') or job.title
+            job.filesize = estimate_filesize(info) or job.filesize
+            eel.updateQueueItem(job.to_dict())
+            reservations = self.reserve_space(job, info, download_path, output_path)
+            result = api.download_media(job.url, job.audio_only, quality, progress_callback=progress_callback,
+                                        info=info, progress_hooks=[reservation_hook, eta_hook])
+        except Exception as e:
+            result = {"success": False, "error": str(e), "error_class": classify_error(e), "exc": e}
+        finally:
+            info = None
+            self.running.pop(job.id, None)
+            if reservations:
+                # The download itself is done with its space, the destination keeps its share until moved
+                reservations.pop(0).release()
+
+        if not result["success"] and job.control:
+            # Stopped on purpose, says nothing about the proxy
+            self.proxy_pool.release(proxy, True)
+            if job.control == 'cancel':
+                api.remove_partial_files()
+        else:
+            release_proxy(self.proxy_pool, proxy, result, time.monotonic() - started)
+        # Left over for the next attempt to resume, deleted if the job is cancelled before that
+        job.partial_files = set() if result["success"] else set(api.partial_files)
+
+        if result["success"] and download_path != output_path:
+            staged_filename = result["filename"]
+            result["filename"] = os.path.join(output_path, os.path.basename(staged_filename))
+            self.mover.move(download_path, output_path, self.on_moved(job, reservations))
+        else:
+            for reservation in reservations:
+                reservation.release()
+            if result["success"]:
+                self.check_duplicates([result["info"].get("filepath") or result["filename"]])
+        result["folder"] = output_path
+        result["elapsed"] = time.monotonic() - started
+        result["transfer_seconds"] = transfer["seconds"]
+        result["transfer_bytes"] = transfer["bytes"]
+        return result
+
+    def on_moved(self, job, reservations):
+        def callback(future):
+            for reservation in reservations:
+                reservation.release()
+            error = future.exception()
+            if error:
+                log_error(f"Failed to move '{job.title or job.url}' out of staging: {str(error)}", exc=error,
+                          job_id=job.id, domain=job.domain, phase="move")
+                eel.updateDownloadList(f"Failed to move {job.title or job.url} to output folder: {error}")
             else:
-                self.api.clear_auth_options()
+                moved, renamed = future.result()
+                for name, new_name in renamed:
+                    eel.updateDownloadList(f"'{name}' already exists in the output folder, saved as '{new_name}'")
+                eel.updateDownloadList(f"Moved to output folder: {job.title or job.url}")
+                self.check_duplicates(moved)
+        return callback
+
+    def discard_staging(self, job):
+        staging_dir = self.get_staging_dir(job)
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def download_worker(self, index):
+        while True:
+            with self.capacity:
+                # Workers beyond the configured concurrency park until it is raised again
+                while index >= int(self.settings['concurrent_downloads']):
+                    self.capacity.wait()
+            job = self.job_queue.get()
+            self.prefetcher.notify()
+            self.current_audio_only = job.audio_only
+            job.status = "downloading"
+            self.queue_eta.start(job.id)
+            eel.updateQueueItem(job.to_dict())
+            eel.updateDownloadList(f"Downloading: {job.title or job.url}")
+            eel.setProgressBar(0.0)
 
-            if audio_only:
-                output_path = self.settings['audio_output_path']
-                quality = None  # Not applicable for audio-only downloads
-            else:
-                output_path = self.settings['video_output_path']
-                quality = self.settings['video_quality']
-
-            self.api.set_output_path(output_path)
-            self.api.set_formats(self.settings['video_format'], self.settings['audio_format'])
-            self.api.set_options(
-                proxy=self.settings['proxy'],
-                sublangs=self.settings['sublangs'],
-                write_thumbnail=self.settings['write_thumbnail'],
-                embed_thumbnail=self.settings['embed_thumbnail'],
-                segments=self.settings['segments'],
-                retries=self.settings['retries'],
-                buffer_size=self.settings['buffer_size']
-            )
-
-            def progress_callback(progress, filename):
-                eel.updateDownloadList(f"Progress for {os.path.basename(filename)}: {progress:.2%}")
-                eel.setProgressBar(progress)
-
-            result = self.api.download_media(url, audio_only, quality, progress_callback=progress_callback)
+            result = self.run_job(job)
+
+            if not result["success"] and job.control == 'pause':
+                job.status = "paused"
+                self.queue_eta.remove(job.id)
+                self.push_eta()
+                eel.updateQueueItem(job.to_dict())
+                eel.updateDownloadList(f"Paused: {job.title or job.url}")
+                eel.setProgressBar(0.0)
+                continue
 
             date_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if not result["success"] and job.control == 'cancel':
+                self.finish_cancelled(job, date_str, result["folder"])
+                eel.setProgressBar(0.0)
+                continue
+            job.attempts.append({
+                "date": date_str,
+                "error": result.get("error"),
+                "error_class": result.get("error_class")
+            })
+
+            if not result["success"] and self.schedule_retry(job, result["error_class"]):
+                eel.setProgressBar(0.0)
+                continue
 
             if result["success"]:
                 filename = os.path.basename(result['filename'])
@@ -177,25 +452,243 @@ class App:
                 log_entry = {
                     "result": "Success",
                     "date": date_str,
-                    "url": url,
-                    "folder": output_path
+                    "url": job.url,
+                    "folder": result["folder"]
                 }
             else:
-                eel.updateDownloadList(f"Download failed: {result['error']}")
+                self.discard_staging(job)
+                log_error(result["error"], exc=result.get("exc"), job_id=job.id, domain=job.domain,
+                          phase="download", error_class=result["error_class"], attempts=len(job.attempts))
+                eel.updateDownloadList(f"Download failed ({result['error_class']}): {result['error']}")
                 log_entry = {
                     "result": "Failed",
                     "date": date_str,
-                    "url": url,
-                    "folder": output_path
+                    "url": job.url,
+                    "folder": result["folder"],
+                    "error_class": result["error_class"]
                 }
+            log_entry["attempts"] = len(job.attempts)
+
+            job.status = "completed" if result["success"] else "failed"
+            if result["success"]:
+                self.queue_eta.history.record(
+                    job.domain, self.get_format_key(job), result["transfer_bytes"],
+                    result["transfer_seconds"], result["elapsed"] - result["transfer_seconds"]
+                )
+            self.queue_eta.remove(job.id)
+            self.push_eta()
+            self.jobs.pop(job.id, None)
+            eel.removeQueueItem(job.id)
 
             eel.setProgressBar(0.0)
             self.download_logs.append(log_entry)
-            self.save_logs()  # Save logs automatically
+            self.save_log_entry(log_entry)  # Save logs automatically
             eel.updateLogsTable(log_entry)
             eel.resetDownloadState()  # Reset the download state in the frontend
 
-            self.download_queue.task_done()
+    def finish_cancelled(self, job, date_str, folder):
+        remove_partial_files(job.partial_files)
+        job.partial_files = set()
+        self.discard_staging(job)
+        job.status = "cancelled"
+        self.queue_eta.remove(job.id)
+        self.push_eta()
+        self.jobs.pop(job.id, None)
+        eel.removeQueueItem(job.id)
+        eel.updateDownloadList(f"Cancelled: {job.title or job.url}")
+        log_entry = {
+            "result": "Cancelled",
+            "date": date_str,
+            "url": job.url,
+            "folder": folder,
+            "attempts": len(job.attempts)
+        }
+        self.download_logs.append(log_entry)
+        self.save_log_entry(log_entry)
+        eel.updateLogsTable(log_entry)
+
+    # Job control
+
+    def cancel_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.control = 'cancel'
+        # The worker may drop the job from running at any moment, look it up once
+        api = self.running.get(job.id)
+        if self.job_queue.remove(job_id) or job.status == "paused":
+            date_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.finish_cancelled(job, date_str, self.get_output_path(job.audio_only))
+            self.prefetcher.notify()
+        elif api is not None:
+            job.status = "cancelling"
+            eel.updateQueueItem(job.to_dict())
+            api.interrupt('cancel')
+        return True
+
+    def pause_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.control:
+            return False
+        job.control = 'pause'
+        api = self.running.get(job.id)
+        if self.job_queue.remove(job_id):
+            job.status = "paused"
+            job.info = None
+            self.queue_eta.remove(job.id)
+            self.push_eta()
+            eel.updateQueueItem(job.to_dict())
+            self.prefetcher.notify()
+        elif api is not None:
+            # Partial files are kept, yt-dlp resumes from them
+            job.status = "pausing"
+            eel.updateQueueItem(job.to_dict())
+            api.interrupt('pause')
+        return True
+
+    def resume_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status != "paused":
+            return False
+        job.control = None
+        job.status = "queued"
+        self.job_queue.put(job, keep_position=True)
+        self.queue_eta.set_queued(job.id, job.domain, self.get_format_key(job), job.filesize)
+        self.push_eta()
+        self.prefetcher.notify()
+        eel.updateQueueItem(job.to_dict())
+        return True
+
+    def move_job(self, job_id, position):
+        moved = self.job_queue.move(job_id, to_front=position == 'front')
+        if moved:
+            self.prefetcher.notify()
+            self.refresh_queue()
+        return moved
+
+    def bump_job_priority(self, job_id):
+        bumped = self.job_queue.bump(job_id)
+        if bumped:
+            self.prefetcher.notify()
+            self.refresh_queue()
+        return bumped
+
+    def refresh_queue(self):
+        eel.setQueueOrder([job.id for job in self.job_queue.pending()])
+        for job in self.job_queue.pending():
+            eel.updateQueueItem(job.to_dict())
+
+    def start_workers(self):
+        with self.capacity:
+            while len(self.worker_threads) < int(self.settings['concurrent_downloads']):
+                worker = threading.Thread(target=self.download_worker, args=(len(self.worker_threads),), daemon=True)
+                self.worker_threads.append(worker)
+                worker.start()
+            self.capacity.notify_all()
+
+    # Duplicate detection
+
+    def get_output_folders(self):
+        return [self.settings['video_output_path'], self.settings['audio_output_path']]
+
+    def index_output_folders(self):
+        self.dedup_index.submit(self.dedup_index.scan, self.get_output_folders(), on_done=self.on_dedup_done)
+
+    def check_duplicates(self, paths):
+        """Compare finished files with the index in the background and apply dedup_action to copies."""
+        self.dedup_index.submit(self.resolve_duplicates, paths, on_done=self.on_dedup_done)
+
+    def resolve_duplicates(self, paths):
+        action = self.settings['dedup_action']
+        for path in paths:
+            duplicates = self.dedup_index.check(path)
+            if not duplicates:
+                continue
+            original = duplicates[0]
+            if action == 'delete':
+                # Nothing is deleted without the user seeing the duplicate first
+                eel.updateDownloadList(f"Duplicate of {original}: {path}")
+                eel.confirmDuplicateDelete({
+                    "path": path,
+                    "original": original,
+                    "size": self.dedup_index.files[path]["size"]
+                })
+                continue
+            reclaimed = self.dedup_index.resolve(path, original, action)
+            if action == 'keep':
+                eel.updateDownloadList(f"Duplicate of {original}: {path}")
+            else:
+                eel.updateDownloadList(
+                    f"Duplicate of {original} ({action}): {path}, reclaimed {reclaimed / MIB:.1f} MiB")
+
+    def delete_duplicate(self, path, original):
+        """Delete a duplicate the user confirmed, once it is known to still match the original."""
+        self.dedup_index.submit(self.delete_confirmed_duplicate, path, original, on_done=self.on_dedup_done)
+
+    def delete_confirmed_duplicate(self, path, original):
+        if original not in self.dedup_index.check(path):
+            eel.updateDownloadList(f"No longer a duplicate, kept: {path}")
+            return
+        reclaimed = self.dedup_index.resolve(path, original, 'delete')
+        eel.updateDownloadList(f"Deleted duplicate {path}, reclaimed {reclaimed / MIB:.1f} MiB")
+
+    def find_duplicates(self):
+        self.dedup_index.submit(self.deduplicate_all, on_done=self.on_dedup_done)
+
+    def deduplicate_all(self):
+        """Re-index every output folder, apply dedup_action to all copies and report the space involved."""
+        eel.updateDownloadList("Looking for duplicates...")
+        self.dedup_index.scan(self.get_output_folders())
+        action = self.settings['dedup_action']
+        copies = 0
+        found = 0
+        reclaimed = 0
+        for group in self.dedup_index.find_duplicates():
+            original = group[0]
+            for path in group[1:]:
+                copies += 1
+                found += self.dedup_index.files[path]["size"]
+                eel.updateDownloadList(f"Duplicate of {original}: {path}")
+                reclaimed += self.dedup_index.resolve(path, original, action)
+        if action == 'keep':
+            summary = f"{found / MIB:.1f} MiB could be reclaimed"
+        else:
+            summary = f"{reclaimed / MIB:.1f} MiB reclaimed ({action})"
+        eel.updateDownloadList(
+            f"Duplicates: {copies} copies, {summary}. "
+            f"Reclaimed so far: {self.dedup_index.reclaimed / MIB:.1f} MiB")
+
+    @staticmethod
+    def on_dedup_done(future):
+        error = future.exception()
+        if error:
+            log_error(f"Duplicate check failed: {str(error)}", exc=error, phase="dedup")
+
+    def collect_cluster_results(self):
+        while True:
+            time.sleep(CLUSTER_POLL_INTERVAL)
+            store = self.cluster_store
+            if store is None:
+                continue
+            try:
+                store.reclaim_expired()
+                for record in store.collect():
+                    self.report_cluster_result(record)
+            except OSError as e:
+                log_error(str(e), phase="cluster_collect")
+
+    def report_cluster_result(self, record):
+        result = record["result"]
+        if result["success"]:
+            filename = os.path.basename(result["filename"])
+            eel.updateDownloadList(f"Download completed on {result['worker']}: {filename}")
+        else:
+            eel.updateDownloadList(
+                f"Download failed on {result['worker']} ({result['error_class']}): {result['error']}")
+        log_entry = result["log_entry"]
+        self.download_logs.append(log_entry)
+        self.save_log_entry(log_entry)
+        eel.updateLogsTable(log_entry)
 
         # Methods for handling settings
 
@@ -210,6 +703,7 @@ class App:
     def set_video_output_path(self, path):
         self.settings['video_output_path'] = path
         self.save_settings_to_file()
+        self.index_output_folders()
 
     def set_audio_format(self, audio_format):
         self.settings['audio_format'] = audio_format
@@ -218,11 +712,25 @@ class App:
     def set_audio_output_path(self, path):
         self.settings['audio_output_path'] = path
         self.save_settings_to_file()
+        self.index_output_folders()
+
+    def set_dedup_action(self, dedup_action):
+        self.settings['dedup_action'] = dedup_action if dedup_action in ACTIONS else 'keep'
+        self.save_settings_to_file()
 
     def set_proxy(self, proxy):
         self.settings['proxy'] = proxy
+        self.proxy_pool.set_proxies(parse_proxies(proxy))
         self.save_settings_to_file()
 
+    def set_proxy_affinity(self, proxy_affinity):
+        self.settings['proxy_affinity'] = proxy_affinity
+        self.proxy_pool.set_affinity(parse_affinity(proxy_affinity))
+        self.save_settings_to_file()
+
+    def get_proxy_status(self):
+        return self.proxy_pool.snapshot()
+
     def set_sublangs(self, sublangs):
         self.settings['sublangs'] = sublangs
         self.save_settings_to_file()
@@ -243,52 +751,48 @@ class App:
         self.settings['retries'] = retries
         self.save_settings_to_file()
 
+    def set_concurrent_downloads(self, concurrent_downloads):
+        self.settings['concurrent_downloads'] = max(int(concurrent_downloads), 1)
+        self.save_settings_to_file()
+        self.start_workers()
+
+    def set_staging_path(self, path):
+        self.settings['staging_path'] = path or None
+        self.save_settings_to_file()
+
+    def set_cluster_store(self, path):
+        self.settings['cluster_store'] = path or None
+        self.save_settings_to_file()
+        self.cluster_store = FileJobStore(path) if path else None
+
     def set_buffer_size(self, buffer_size):
         self.settings['buffer_size'] = buffer_size if self.api.validate_buffer_size(buffer_size) else '1M'
         self.save_settings_to_file()
 
     def reset_settings(self):
-        self.settings = {
-            # Video Settings
-            'video_quality': 'Best',
-            'video_format': 'auto',
-            'video_output_path': get_default_output_path(for_audio=False),
-
-            # Audio Settings
-            'audio_format': 'auto',
-            'audio_output_path': get_default_output_path(for_audio=True),
-
-            # Other Settings
-            'proxy': None,
-            'sublangs': None,
-            'write_thumbnail': False,
-            'embed_thumbnail': False,
-
-            # Additional Settings
-            'segments': 4,
-            'retries': 5,
-            'buffer_size': '16M'
-        }
+        self.settings = default_settings()
+        self.proxy_pool.set_proxies([])
+        self.proxy_pool.set_affinity({})
+        self.cluster_store = None
         self.save_settings_to_file()
         return self.settings
 
     def get_logs(self):
-        return self.download_logs
+        return list(self.download_logs)
 
-    def save_logs(self):
-        logs_dir = get_config_path() / "logs"
-        logs_dir.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        log_filename = logs_dir / f"O2-{timestamp}.log"
-        with open(log_filename, 'w', encoding='utf-8') as f:
-            json.dump(self.download_logs, f, ensure_ascii=False, indent=4)
+    def save_log_entry(self, log_entry):
+        # One JSON line per entry, appended to this session's log file
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
 
     def load_settings_from_file(self):
         config_dir = get_config_path()
         settings_file = config_dir / "setting.json"
         if settings_file.exists():
             with open(settings_file, 'r', encoding='utf-8') as f:
-                self.settings = json.load(f)
+                # Keep defaults for settings added since the file was written
+                self.settings.update(json.load(f))
         else:
             self.save_settings_to_file()
 
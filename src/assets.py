@@ -0,0 +1,292 @@
+# assets.py
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import determine_ext, replace_extension, subtitles_filename
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Thumbnail formats EmbedThumbnail uses as they are, anything else it converts to png
+EMBEDDABLE_THUMBNAIL_EXTS = ('jpg', 'jpeg', 'png')
+
+# Subtitles that can be fetched with a single request
+PLAIN_PROTOCOLS = (None, 'http', 'https')
+
+
+def asset_prefix(info):
+    """Key prefix shared by every asset of one piece of media, stable across signed URLs."""
+    if info.get('extractor_key') and info.get('id'):
+        return f"{info['extractor_key']}:{info['id']}"
+    return "url:" + hashlib.sha256((info.get('webpage_url') or info.get('url') or '').encode()).hexdigest()
+
+
+def convert_image(data, ext):
+    """Convert image bytes to another format with FFmpeg."""
+    fd, src = tempfile.mkstemp()
+    dst = src + '.' + ext
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', src, '-frames:v', '1', '-update', '1', dst],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        with open(dst, 'rb') as f:
+            return f.read()
+    finally:
+        for path in (src, dst):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class AssetCache:
+    """Content-addressed cache for thumbnails and subtitles, shared by all jobs.
+
+    Blobs are named by the sha256 of their content and an index maps asset keys to them,
+    so identical assets are stored once. Least recently used blobs are evicted past max_bytes.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, workers=4):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.index_file = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self._index = {}  # asset key -> blob name
+        self._sizes = {}  # blob name -> bytes
+        self._inflight = {}  # asset key -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='assets')
+        self.load()
+
+    def load(self):
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        for entry in os.scandir(self.blob_dir):
+            if entry.is_file() and not entry.name.startswith('.'):
+                self._sizes[entry.name] = entry.stat().st_size
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self._index = {key: name for key, name in json.load(f).items() if name in self._sizes}
+            except (OSError, ValueError):
+                self._index = {}
+
+    def save(self):
+        tmp = self.index_file.with_name(self.index_file.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp, self.index_file)
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        name = self._index.get(key)
+        if name is None:
+            return None
+        path = self.blob_dir / name
+        try:
+            # mtime doubles as the last use for eviction
+            os.utime(path)
+        except OSError:
+            self._index.pop(key, None)
+            self._sizes.pop(name, None)
+            return None
+        return path
+
+    def put(self, key, data, ext):
+        name = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = self.blob_dir / name
+        with self._lock:
+            if name not in self._sizes:
+                tmp = self.blob_dir / f".{name}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                self._sizes[name] = len(data)
+            else:
+                os.utime(path)
+            self._index[key] = name
+            self._evict()
+            self.save()
+        return path
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(self._sizes, key=lambda name: os.stat(self.blob_dir / name).st_mtime)
+        evicted = set()
+        for name in by_age:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self.blob_dir / name)
+            except OSError:
+                pass
+            total -= self._sizes.pop(name)
+            evicted.add(name)
+        self._index = {key: name for key, name in self._index.items() if name not in evicted}
+
+    def fetch(self, key, ext, loader):
+        """Future for the cached path of an asset, loading it in the background on a miss.
+
+        loader returns the asset's bytes, or None if it is not available.
+        Concurrent requests for the same key share one load.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            path = self._get(key)
+            if path is not None:
+                future = Future()
+                future.set_result(path)
+                return future
+            future = self._executor.submit(self._load, key, ext, loader)
+            self._inflight[key] = future
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        # Finished loads live on in the index, only loads still running need sharing
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def _load(self, key, ext, loader):
+        data = loader()
+        return self.put(key, data, ext) if data is not None else None
+
+    def prepare(self, info, opener, thumbnail=False, convert_thumbnail=False, subtitles=False):
+        """Start fetching the assets a download of info will write. Returns {asset: Future}.
+
+        opener(url, headers) returns the bytes at url.
+        """
+        futures = {}
+        prefix = asset_prefix(info)
+        thumbnails = info.get('thumbnails') or []
+        if thumbnail and thumbnails and thumbnails[-1].get('url'):
+            # yt-dlp writes the last (best) thumbnail
+            t = thumbnails[-1]
+            ext = t.get('ext') or determine_ext(t['url'], 'jpg')
+            headers = t.get('http_headers') or info.get('http_headers') or {}
+            key = f"{prefix}:thumbnail:{t.get('id')}"
+            if convert_thumbnail and ext not in EMBEDDABLE_THUMBNAIL_EXTS:
+                # Converted once, later jobs embed the cached png as it is
+                futures['thumbnail'] = self.fetch(
+                    f"{key}.png", 'png', lambda url=t['url']: convert_image(opener(url, headers), 'png'))
+            else:
+                futures['thumbnail'] = self.fetch(f"{key}.{ext}", ext, lambda url=t['url']: opener(url, headers))
+
+        if subtitles:
+            for lang, sub in (info.get('requested_subtitles') or {}).items():
+                if sub.get('data') is not None or not sub.get('url') or sub.get('protocol') not in PLAIN_PROTOCOLS:
+                    continue
+                headers = sub.get('http_headers') or info.get('http_headers') or {}
+                futures[lang] = self.fetch(f"{prefix}:subtitles:{lang}.{sub['ext']}", sub['ext'],
+                                           lambda url=sub['url'], headers=headers: opener(url, headers))
+        return futures
+
+    def apply(self, info, opener, thumbnail=False, convert_thumbnail=False, subtitles=False):
+        """Hand the assets of info to yt-dlp without another request, and without waiting for any.
+
+        Subtitle text goes into requested_subtitles and the thumbnail URL becomes a data: URL of
+        the cached image. Assets still loading are taken out of info, so yt-dlp neither fetches nor
+        waits for them, and returned as {asset: (Future, removed)} for PlaceAssetsPP to put back.
+        """
+        pending = {}
+        for name, future in self.prepare(info, opener, thumbnail, convert_thumbnail, subtitles).items():
+            if not future.done():
+                pending[name] = (future, _detach(info, name))
+                continue
+            try:
+                path = future.result()
+                if path is None:
+                    continue
+                if name == 'thumbnail':
+                    ext = path.suffix[1:]
+                    mime = 'image/jpeg' if ext in ('jpg', 'jpeg') else f'image/{ext}'
+                    thumbnail_info = info['thumbnails'][-1]
+                    thumbnail_info['url'] = f"data:{mime};base64,{base64.b64encode(path.read_bytes()).decode()}"
+                    thumbnail_info['ext'] = ext
+                else:
+                    with open(path, 'r', encoding='utf-8', newline='') as f:
+                        info['requested_subtitles'][name]['data'] = f.read()
+            except Exception:
+                # Left for yt-dlp to fetch itself
+                continue
+        return pending
+
+
+def _detach(info, name):
+    """Take an asset out of info so yt-dlp skips it. Returns what was removed."""
+    if name == 'thumbnail':
+        # An empty list, not None, or yt-dlp rebuilds it from the single thumbnail URL
+        removed = {'thumbnails': info.get('thumbnails'), 'thumbnail': info.get('thumbnail')}
+        info['thumbnails'] = []
+        info.pop('thumbnail', None)
+        return removed
+    # yt-dlp selects requested_subtitles again from these lists, so the language goes from all of them
+    removed = {'subtitle': info['requested_subtitles'].pop(name)}
+    for key in ('subtitles', 'automatic_captions'):
+        if name in (info.get(key) or {}):
+            removed[key] = info[key].pop(name)
+    return removed
+
+
+class PlaceAssetsPP(PostProcessor):
+    """Writes the assets AssetCache.apply held back once the media is downloaded, where yt-dlp would have.
+
+    Added ahead of the other post_process postprocessors, so EmbedThumbnail finds the thumbnail on disk.
+    """
+
+    def __init__(self, downloader, pending, timeout=60.0):
+        super().__init__(downloader)
+        self.pending = pending
+        self.timeout = timeout
+
+    def run(self, info):
+        deadline = time.monotonic() + self.timeout
+        for name, (future, removed) in self.pending.items():
+            try:
+                path = future.result(timeout=max(deadline - time.monotonic(), 0))
+            except Exception:
+                path = None
+
+            if name == 'thumbnail':
+                info['thumbnails'] = removed['thumbnails']
+                if removed['thumbnail']:
+                    info['thumbnail'] = removed['thumbnail']
+                if path is None or not info['thumbnails']:
+                    self.report_warning('Unable to fetch thumbnail')
+                    continue
+                filename = replace_extension(
+                    self._downloader.prepare_filename(info, 'thumbnail'), path.suffix[1:], info.get('ext'))
+                shutil.copyfile(path, filename)
+                info['thumbnails'][-1]['filepath'] = filename
+            else:
+                for key in ('subtitles', 'automatic_captions'):
+                    if key in removed:
+                        info.setdefault(key, {})[name] = removed[key]
+                if path is None:
+                    self.report_warning(f'Unable to fetch {name} subtitles')
+                    continue
+                sub_info = removed['subtitle']
+                filename = subtitles_filename(
+                    self._downloader.prepare_filename(info, 'subtitle'), name, sub_info['ext'], info.get('ext'))
+                shutil.copyfile(path, filename)
+                sub_info['filepath'] = filename
+                info['requested_subtitles'] = info.get('requested_subtitles') or {}
+                info['requested_subtitles'][name] = sub_info
+            self.to_screen(f'Wrote cached {name} to: {filename}')
+        return [], info
@@ -0,0 +1,292 @@
+# cluster.py
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from api import DownloaderAPI, create_api, release_proxy
+from assets import AssetCache
+from auth import AuthManager
+from proxy import ProxyPool, parse_affinity, parse_proxies
+from retry import backoff_delay, is_transient
+from world import get_domain_from_url, log_error
+
+# Settings a coordinator hands to workers along with each job
+JOB_SETTINGS = (
+    'video_quality', 'video_format', 'audio_format', 'sublangs', 'write_thumbnail', 'embed_thumbnail',
+    'segments', 'retries', 'buffer_size', 'proxy', 'proxy_affinity',
+)
+
+# A job just renamed into leased/ has no expiry until its worker stamps it, it is left alone this long
+CLAIM_TIMEOUT = 60.0
+
+# Error class recorded when a worker stops sending heartbeats
+WORKER_LOST = "worker_lost"
+
+
+def _write_json(path, data):
+    # Write then rename so readers on other hosts never see a half-written file
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class FileJobStore:
+    """A job queue kept in a shared directory, leased to workers with heartbeats.
+
+    Jobs move between pending/, leased/ and done/ by atomic renames, so any number of
+    worker processes on any host that can see the directory can share it. Lease expiry
+    uses wall-clock time, so hosts need reasonably synchronised clocks.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.pending_dir = self.root / "pending"
+        self.leased_dir = self.root / "leased"
+        self.done_dir = self.root / "done"
+        self.archive_file = self.root / "archive.txt"
+        for directory in (self.pending_dir, self.leased_dir, self.done_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, url, audio_only, settings):
+        job_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        job = {
+            "id": job_id,
+            "url": url,
+            "audio_only": audio_only,
+            "settings": {key: settings.get(key) for key in JOB_SETTINGS},
+            "attempts": [],
+            "not_before": 0.0,
+        }
+        _write_json(self.pending_dir / f"{job_id}.json", job)
+        return job_id
+
+    def lease(self, worker_id, lease_seconds):
+        """Claim the oldest ready job for this worker, or return None."""
+        now = time.time()
+        for path in sorted(self.pending_dir.glob("*.json")):
+            job = _read_json(path)
+            if job is None or job.get("not_before", 0.0) > now:
+                continue
+            leased_path = self.leased_dir / path.name
+            try:
+                # The rename keeps this mtime, reclaim_expired counts CLAIM_TIMEOUT from it until the lease is stamped
+                os.utime(path)
+                # Only one worker can win the rename
+                os.rename(path, leased_path)
+            except OSError:
+                continue
+            job["worker"] = worker_id
+            job["expires"] = time.time() + lease_seconds
+            _write_json(leased_path, job)
+            return job
+        return None
+
+    def heartbeat(self, job, lease_seconds):
+        """Extend the lease. Returns False if the job was reclaimed from this worker."""
+        path = self.leased_dir / f"{job['id']}.json"
+        current = _read_json(path)
+        if current is None or current.get("worker") != job["worker"]:
+            return False
+        job["expires"] = time.time() + lease_seconds
+        _write_json(path, job)
+        return True
+
+    def release(self, job, delay=0.0):
+        """Put a leased job back in the queue, e.g. to retry it later."""
+        job.pop("worker", None)
+        job.pop("expires", None)
+        job["not_before"] = time.time() + delay
+        _write_json(self.pending_dir / f"{job['id']}.json", job)
+        self._remove(self.leased_dir / f"{job['id']}.json")
+
+    def complete(self, job, result):
+        _write_json(self.done_dir / f"{job['id']}.json", {"job": job, "result": result})
+        self._remove(self.leased_dir / f"{job['id']}.json")
+
+    def reclaim_expired(self):
+        """Return jobs whose worker stopped sending heartbeats to the queue.
+
+        Each reclaim counts as a failed attempt, so a job that keeps killing its worker
+        ends up in done/ as failed once it runs out of retries.
+        """
+        reclaimed = 0
+        now = time.time()
+        for path in self.leased_dir.glob("*.json"):
+            job = _read_json(path)
+            if job is None:
+                continue
+            try:
+                expires = job["expires"] if "expires" in job else os.stat(path).st_mtime + CLAIM_TIMEOUT
+                if expires > now:
+                    continue
+                # Take it out of leased/ first so a concurrent reclaim cannot count it twice
+                claimed_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.reclaim")
+                os.rename(path, claimed_path)
+            except OSError:
+                continue
+
+            worker = job.pop("worker", None)
+            job.pop("expires", None)
+            job["attempts"].append({
+                "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "worker": worker,
+                "error": "Worker stopped responding",
+                "error_class": WORKER_LOST
+            })
+            if len(job["attempts"]) > int(job["settings"]['retries']):
+                result = {"success": False, "error": "Worker stopped responding", "error_class": WORKER_LOST}
+                self.complete(job, job_report(job, result, worker, None))
+            else:
+                _write_json(self.pending_dir / path.name, job)
+            self._remove(claimed_path)
+            reclaimed += 1
+        return reclaimed
+
+    def collect(self):
+        """Yield finished jobs once, recording successful ones in the shared download archive."""
+        for path in sorted(self.done_dir.glob("*.json")):
+            record = _read_json(path)
+            if record is None:
+                continue
+            archive_id = record["result"].get("archive_id")
+            if archive_id:
+                with open(self.archive_file, 'a', encoding='utf-8') as f:
+                    f.write(archive_id + '\n')
+            self._remove(path)
+            yield record
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def job_report(job, result, worker, folder):
+    """The record a finished job leaves in done/ for the coordinator."""
+    log_entry = {
+        "result": "Success" if result["success"] else "Failed",
+        "date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "url": job["url"],
+        "folder": folder
+    }
+    if not result["success"]:
+        log_entry["error_class"] = result["error_class"]
+    log_entry["attempts"] = len(job["attempts"])
+    log_entry["worker"] = worker
+    return {
+        "success": result["success"],
+        "filename": result.get("filename"),
+        "error": result.get("error"),
+        "error_class": result.get("error_class"),
+        "worker": worker,
+        "log_entry": log_entry
+    }
+
+
+class ClusterWorker:
+    """Pulls jobs from a FileJobStore and runs them through the regular DownloaderAPI pipeline."""
+
+    def __init__(self, store, video_output_path, audio_output_path, worker_id=None, rate_limit=None,
+                 lease_seconds=60, poll_interval=2.0):
+        self.store = store
+        self.video_output_path = video_output_path
+        self.audio_output_path = audio_output_path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.rate_limit = rate_limit
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.auth_manager = AuthManager()
+        self.asset_cache = AssetCache(os.path.join(DownloaderAPI().options['cachedir'], "assets"))
+        self.proxy_pool = ProxyPool()
+        self.proxy_settings = None
+
+    def run(self):
+        while True:
+            job = self.store.lease(self.worker_id, self.lease_seconds)
+            if job is None:
+                self.store.reclaim_expired()
+                time.sleep(self.poll_interval)
+                continue
+            self.process(job)
+
+    def acquire_proxy(self, job):
+        settings = job["settings"]
+        proxy_settings = (settings.get('proxy'), settings.get('proxy_affinity'))
+        if proxy_settings != self.proxy_settings:
+            # Jobs carry the coordinator's proxy settings, keep the pool's health data while they stay the same
+            self.proxy_settings = proxy_settings
+            self.proxy_pool.set_proxies(parse_proxies(proxy_settings[0]))
+            self.proxy_pool.set_affinity(parse_affinity(proxy_settings[1]))
+        return self.proxy_pool.acquire(get_domain_from_url(job["url"]))
+
+    def process(self, job):
+        proxy = self.acquire_proxy(job)
+        output_path = self.audio_output_path if job["audio_only"] else self.video_output_path
+        api = create_api(job["url"], job["settings"], self.auth_manager, output_path, proxy, self.asset_cache,
+                         self.rate_limit)
+        quality = None if job["audio_only"] else job["settings"]['video_quality']
+        finished = threading.Event()
+        lost = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(self.lease_seconds / 3):
+                if not self.store.heartbeat(job, self.lease_seconds):
+                    # Someone reclaimed the job, stop working on it
+                    lost.set()
+                    api.interrupt('cancel')
+                    return
+
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+        started = time.monotonic()
+        try:
+            result = api.download_media(job["url"], job["audio_only"], quality)
+        finally:
+            finished.set()
+            # The job dict and its leased file are only touched again once the heartbeat is done with them
+            heartbeat_thread.join()
+        if lost.is_set():
+            self.proxy_pool.release(proxy, True)
+            return
+        release_proxy(self.proxy_pool, proxy, result, time.monotonic() - started)
+
+        date_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        job["attempts"].append({
+            "date": date_str,
+            "worker": self.worker_id,
+            "error": result.get("error"),
+            "error_class": result.get("error_class")
+        })
+
+        if not result["success"]:
+            attempt = len(job["attempts"])
+            if is_transient(result["error_class"]) and attempt <= int(job["settings"]['retries']):
+                self.store.release(job, backoff_delay(attempt))
+                return
+
+        if not result["success"]:
+            log_error(result["error"], exc=result.get("exc"), job_id=job["id"],
+                      domain=get_domain_from_url(job["url"]), phase="download", error_class=result["error_class"],
+                      attempts=len(job["attempts"]), worker=self.worker_id)
+        report = job_report(job, result, self.worker_id, api.output_path)
+        info = result.get("info") or {}
+        if result["success"] and info.get("extractor_key") and info.get("id"):
+            report["archive_id"] = f"{info['extractor_key'].lower()} {info['id']}"
+        self.store.complete(job, report)
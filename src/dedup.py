@@ -0,0 +1,201 @@
+# dedup.py
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import RESERVE_SUFFIX
+from world import get_config_path
+
+# Files are hashed in chunks of this size, so memory use does not depend on file size
+CHUNK_SIZE = 1024 * 1024
+
+# Subtitles, thumbnails and other small files are not worth indexing
+MIN_SIZE = 1024 * 1024
+
+SKIP_SUFFIXES = ('.part', '.ytdl', '.tmp', RESERVE_SUFFIX)
+
+ACTIONS = ('keep', 'hardlink', 'delete')
+
+
+def file_digest(path):
+    """blake2b of a file's content, read in CHUNK_SIZE pieces."""
+    digest = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_duplicate(path, original, action):
+    """Hardlink or delete path, a duplicate of original. Returns the bytes reclaimed."""
+    if action not in ('hardlink', 'delete'):
+        return 0
+    st = os.stat(path)
+    if os.path.samefile(path, original):
+        return 0
+    if action == 'hardlink':
+        if st.st_dev != os.stat(original).st_dev:
+            # Hardlinks cannot cross filesystems, leave the copy alone
+            return 0
+        tmp = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+        os.link(original, tmp)
+        os.replace(tmp, path)
+    else:
+        os.remove(path)
+    return st.st_size if st.st_nlink == 1 else 0
+
+
+class DedupIndex:
+    """Content hashes of files in the output folders, used to spot the same media downloaded twice.
+
+    Entries are keyed by path and only re-read when size or mtime change. Files are hashed lazily,
+    once another file of the same size shows up. Work runs on a single background thread.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_config_path() / "dedup.json"
+        self.files = {}  # path -> {"size", "mtime", "hash"}
+        self.folders = []  # every output folder seen so far
+        self.reclaimed = 0
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dedup')
+        self.load()
+
+    def load(self):
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.files = data.get("files", {})
+                self.folders = data.get("folders", [])
+                self.reclaimed = data.get("reclaimed", 0)
+            except (OSError, ValueError):
+                self.files = {}
+
+    def save(self):
+        with self._lock:
+            data = {"folders": self.folders, "reclaimed": self.reclaimed, "files": self.files}
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def submit(self, fn, *args, on_done=None):
+        future = self._executor.submit(fn, *args)
+        if on_done:
+            future.add_done_callback(on_done)
+        return future
+
+    def _update(self, path, st):
+        entry = self.files.get(path)
+        if entry is None or entry["size"] != st.st_size or entry["mtime"] != st.st_mtime:
+            entry = {"size": st.st_size, "mtime": st.st_mtime, "hash": None}
+            self.files[path] = entry
+        return entry
+
+    def _hash(self, path):
+        entry = self.files[path]
+        if entry["hash"] is None:
+            entry["hash"] = file_digest(path)
+        return entry["hash"]
+
+    def scan(self, folders):
+        """Bring the index up to date for the given folders and every folder scanned before."""
+        with self._lock:
+            for folder in folders:
+                if folder and os.path.isdir(folder) and os.path.abspath(folder) not in self.folders:
+                    self.folders.append(os.path.abspath(folder))
+            seen = set()
+            for folder in self.folders:
+                for root, _, names in os.walk(folder):
+                    for name in names:
+                        if name.startswith('.') or name.endswith(SKIP_SUFFIXES):
+                            continue
+                        path = os.path.join(root, name)
+                        try:
+                            st = os.stat(path)
+                        except OSError:
+                            continue
+                        if st.st_size >= MIN_SIZE:
+                            self._update(path, st)
+                            seen.add(path)
+            for path in [p for p in self.files if p not in seen]:
+                del self.files[path]
+            self.save()
+
+    def check(self, path):
+        """Index a newly finished file. Returns the indexed files it duplicates."""
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return []
+            if st.st_size < MIN_SIZE:
+                return []
+            self._update(path, st)
+            duplicates = []
+            for other, entry in list(self.files.items()):
+                if other == path or entry["size"] != st.st_size:
+                    continue
+                if not self._still_current(other):
+                    continue
+                if self._hash(other) == self._hash(path) and not os.path.samefile(other, path):
+                    duplicates.append(other)
+            self.save()
+            return sorted(duplicates, key=lambda p: self.files[p]["mtime"])
+
+    def _still_current(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            del self.files[path]
+            return False
+        entry = self.files[path]
+        if entry["size"] != st.st_size or entry["mtime"] != st.st_mtime:
+            self._update(path, st)
+        return True
+
+    def find_duplicates(self):
+        """Groups of paths with identical content, oldest file first."""
+        with self._lock:
+            by_size = {}
+            for path, entry in self.files.items():
+                by_size.setdefault(entry["size"], []).append(path)
+            groups = []
+            for paths in by_size.values():
+                if len(paths) < 2:
+                    continue
+                by_hash = {}
+                inodes = set()
+                for path in paths:
+                    try:
+                        st = os.stat(path)
+                        if (st.st_dev, st.st_ino) in inodes:
+                            # Already hardlinked to a file in the group, takes no extra space
+                            continue
+                        inodes.add((st.st_dev, st.st_ino))
+                        by_hash.setdefault(self._hash(path), []).append(path)
+                    except OSError:
+                        continue
+                groups.extend(sorted(group, key=lambda p: self.files[p]["mtime"])
+                              for group in by_hash.values() if len(group) > 1)
+            self.save()
+            return groups
+
+    def resolve(self, path, original, action):
+        """Apply action to path, a duplicate of original, and count the space it frees."""
+        with self._lock:
+            reclaimed = resolve_duplicate(path, original, action)
+            if not os.path.exists(path):
+                self.files.pop(path, None)
+            elif path in self.files:
+                # A hardlinked copy now shares the original's mtime, keep its known hash
+                digest = self.files[path]["hash"]
+                self._update(path, os.stat(path))["hash"] = digest
+            self.reclaimed += reclaimed
+            self.save()
+            return reclaimed
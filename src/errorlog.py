@@ -0,0 +1,135 @@
+# errorlog.py
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+MAX_BYTES = 5 * 1024 * 1024
+MAX_AGE = 24 * 60 * 60
+BACKUP_COUNT = 5
+BUFFER_SIZE = 10000
+
+# Records written per wake-up of the writer thread
+BATCH_SIZE = 256
+
+
+class ErrorLog:
+    """Structured error records, written as JSONL by a background thread into a rotating file.
+
+    Callers only enqueue. When the buffer is full new records are dropped and counted,
+    and the count is written once the writer catches up.
+    """
+
+    def __init__(self, directory, filename="O2-error.jsonl", max_bytes=MAX_BYTES, max_age=MAX_AGE,
+                 backup_count=BACKUP_COUNT, buffer_size=BUFFER_SIZE):
+        self.path = Path(directory) / filename
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._lock = threading.Lock()
+        self._file = None
+        self._rollover_at = 0.0
+        threading.Thread(target=self._run, name='error-log', daemon=True).start()
+
+    def log(self, message, exc=None, **fields):
+        record = {"time": time.time(), "message": message, "exc": exc}
+        record.update(fields)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Block until everything logged so far is on disk, or the timeout passes."""
+        marker = threading.Event()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            markers = []
+            try:
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        markers.append(item)
+                    else:
+                        self._write(self._format(item))
+                with self._lock:
+                    dropped, self.dropped = self.dropped, 0
+                if dropped:
+                    self._write(self._format({
+                        "time": time.time(),
+                        "message": f"{dropped} error records dropped, buffer full",
+                        "phase": "error_log"
+                    }))
+                if self._file:
+                    self._file.flush()
+            except OSError:
+                # Nowhere left to report it, try again with the next batch
+                self._close()
+            finally:
+                for marker in markers:
+                    marker.set()
+
+    @staticmethod
+    def _format(record):
+        exc = record.pop("exc", None)
+        record["timestamp"] = datetime.fromtimestamp(record.pop("time")).isoformat(timespec='milliseconds')
+        if exc is not None:
+            record["error_type"] = type(exc).__name__
+            record["traceback"] = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        return json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+    def _write(self, line):
+        if self._file is None:
+            self._open()
+        if self._file.tell() >= self.max_bytes or time.time() >= self._rollover_at:
+            self._rotate()
+        self._file.write(line)
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Like logging's TimedRotatingFileHandler, an existing file's age counts from its last write
+        started = os.stat(self.path).st_mtime if self.path.exists() else time.time()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._rollover_at = started + self.max_age
+
+    def _close(self):
+        if self._file:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _rotate(self):
+        self._close()
+        # O2-error.jsonl.1 is the most recent backup
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._rollover_at = time.time() + self.max_age
@@ -0,0 +1,132 @@
+# eta.py
+
+import json
+import threading
+
+from world import get_config_path
+
+# Weight of the newest job in the per-domain averages
+EWMA_ALPHA = 0.2
+
+# Used until a domain/format has any history
+DEFAULT_THROUGHPUT = 2 * 1024 * 1024
+DEFAULT_OVERHEAD = 5.0
+DEFAULT_SIZE = 100 * 1024 * 1024
+
+
+def _ewma(current, sample):
+    return sample if current is None else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+
+class ThroughputHistory:
+    """Throughput, per-job overhead and typical size learned from completed jobs, per domain and format."""
+
+    def __init__(self, path=None):
+        self.path = path or get_config_path() / "throughput.json"
+        self.stats = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.stats = json.load(f)
+            except (OSError, ValueError):
+                self.stats = {}
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, ensure_ascii=False, indent=4)
+
+    @staticmethod
+    def _keys(domain, fmt):
+        # Most specific first, falling back to the domain and then to everything
+        return [f"{domain}|{fmt}", f"{domain}|*", "*"]
+
+    def record(self, domain, fmt, nbytes, transfer_seconds, overhead_seconds):
+        with self._lock:
+            for key in self._keys(domain, fmt):
+                entry = self.stats.setdefault(key, {"throughput": None, "overhead": None, "size": None, "count": 0})
+                if nbytes and transfer_seconds > 0:
+                    entry["throughput"] = _ewma(entry["throughput"], nbytes / transfer_seconds)
+                if nbytes:
+                    entry["size"] = _ewma(entry["size"], nbytes)
+                entry["overhead"] = _ewma(entry["overhead"], max(overhead_seconds, 0.0))
+                entry["count"] += 1
+            self.save()
+
+    def lookup(self, domain, fmt, field, default):
+        with self._lock:
+            for key in self._keys(domain, fmt):
+                value = self.stats.get(key, {}).get(field)
+                if value is not None:
+                    return value
+        return default
+
+    def estimate(self, domain, fmt, size=None):
+        """Expected seconds for a job, from its size estimate or the typical size for the domain."""
+        size = size or self.lookup(domain, fmt, "size", DEFAULT_SIZE)
+        throughput = self.lookup(domain, fmt, "throughput", DEFAULT_THROUGHPUT)
+        overhead = self.lookup(domain, fmt, "overhead", DEFAULT_OVERHEAD)
+        return overhead + size / throughput
+
+
+class QueueEta:
+    """Rolling ETA for the whole queue, kept up to date incrementally as jobs come and go."""
+
+    def __init__(self, history):
+        self.history = history
+        self._queued = {}  # job id -> estimated seconds
+        self._queued_total = 0.0
+        self._active = {}  # job id -> estimated seconds left
+        self._lock = threading.Lock()
+
+    def set_queued(self, job_id, domain, fmt, size=None):
+        """Add a queued job, or refresh its estimate once its size is known."""
+        estimate = self.history.estimate(domain, fmt, size)
+        with self._lock:
+            self._queued_total += estimate - self._queued.get(job_id, 0.0)
+            self._queued[job_id] = estimate
+
+    def refresh_queued(self, job_id, domain, fmt, size=None):
+        """Refresh a job's estimate once its size is known, unless it has left the queue meanwhile."""
+        estimate = self.history.estimate(domain, fmt, size)
+        with self._lock:
+            if job_id in self._queued:
+                self._queued_total += estimate - self._queued[job_id]
+                self._queued[job_id] = estimate
+
+    def start(self, job_id):
+        with self._lock:
+            estimate = self._queued.pop(job_id, None)
+            if estimate is not None:
+                self._queued_total -= estimate
+                self._active[job_id] = estimate
+
+    def sample(self, job_id, remaining_bytes, speed):
+        """Replace a running job's estimate with one from its live transfer speed."""
+        if speed:
+            with self._lock:
+                if job_id in self._active:
+                    self._active[job_id] = remaining_bytes / speed
+
+    def remove(self, job_id):
+        with self._lock:
+            estimate = self._queued.pop(job_id, None)
+            if estimate is not None:
+                self._queued_total -= estimate
+            self._active.pop(job_id, None)
+
+    def eta(self, concurrency=1):
+        """Seconds until every queued and running job is done."""
+        with self._lock:
+            if not self._queued and not self._active:
+                return 0.0
+            total = max(self._queued_total, 0.0) + sum(self._active.values())
+            longest = max(self._active.values(), default=0.0)
+        return max(total / max(concurrency, 1), longest)
+
+    def remaining_jobs(self):
+        with self._lock:
+            return len(self._queued) + len(self._active)
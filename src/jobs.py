@@ -0,0 +1,173 @@
+# jobs.py
+
+import bisect
+import itertools
+import threading
+import time
+import uuid
+
+from api import estimate_filesize
+from world import get_domain_from_url
+
+
+class Job:
+    # Jobs can pile up by the thousand in long sessions, so keep them small
+    __slots__ = (
+        'id', 'uid', 'url', 'audio_only', 'domain', 'status', 'title', 'filesize',
+        'attempts', 'not_before', 'info', 'info_expires', 'info_proxy', 'prefetch_failed',
+        'priority', 'order', 'control', 'partial_files',
+    )
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url, audio_only):
+        self.id = next(Job._ids)
+        # id restarts at 1 every session, uid names things that outlive the process
+        self.uid = uuid.uuid4().hex
+        self.url = url
+        self.audio_only = audio_only
+        self.domain = get_domain_from_url(url)
+        self.status = "queued"
+        self.title = None
+        self.filesize = None
+
+        # Retry scheduling
+        self.attempts = []
+        self.not_before = 0.0
+
+        # Queue position, higher priority first then by order
+        self.priority = 0
+        self.order = 0.0
+
+        # Set to 'cancel' or 'pause' when the user stops the job
+        self.control = None
+        # Partial files kept for resuming, deleted if the job is cancelled while not running
+        self.partial_files = set()
+
+        # Prefetched metadata, only valid until info_expires
+        self.info = None
+        self.info_expires = 0.0
+        # Proxy the metadata was resolved through, signed media URLs may only work from its IP
+        self.info_proxy = None
+        self.prefetch_failed = False
+
+    def __lt__(self, other):
+        # Queue order, higher priority first then by order
+        return (-self.priority, self.order) < (-other.priority, other.order)
+
+    def has_fresh_info(self):
+        return self.info is not None and time.monotonic() < self.info_expires
+
+    def set_prefetched(self, info, ttl):
+        if self.status != "queued":
+            return
+        self.info = info
+        self.info_expires = time.monotonic() + ttl
+        self.title = info.get('title') or self.title
+        self.filesize = estimate_filesize(info) or self.filesize
+
+    def take_prefetched(self, proxy=None):
+        """Return the prefetched info if it is still fresh and was resolved through proxy, and release it."""
+        info = self.info if self.has_fresh_info() and self.info_proxy == proxy else None
+        self.info = None
+        self.info_expires = 0.0
+        self.info_proxy = None
+        return info
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "audio_only": self.audio_only,
+            "status": self.status,
+            "title": self.title,
+            "filesize": self.filesize,
+            "attempts": len(self.attempts),
+            "priority": self.priority,
+        }
+
+
+class JobQueue:
+    def __init__(self, cooldown=None):
+        self.cooldown = cooldown
+        self._jobs = []
+        self._order = itertools.count(1)
+        self._cond = threading.Condition()
+
+    def _sort(self):
+        self._jobs.sort()
+
+    def put(self, job, delay=0.0, keep_position=False):
+        """Queue a job behind the others of its priority, or back where it was with keep_position."""
+        with self._cond:
+            job.not_before = time.monotonic() + delay
+            if not keep_position or not job.order:
+                job.order = next(self._order)
+            # The list is kept sorted, so a queue of thousands does not need a full sort per job
+            bisect.insort(self._jobs, job)
+            self._cond.notify()
+
+    def remove(self, job_id):
+        with self._cond:
+            for i, job in enumerate(self._jobs):
+                if job.id == job_id:
+                    return self._jobs.pop(i)
+            return None
+
+    def move(self, job_id, to_front=True):
+        with self._cond:
+            job = next((j for j in self._jobs if j.id == job_id), None)
+            if job is None:
+                return False
+            if to_front:
+                job.priority = max(j.priority for j in self._jobs)
+                job.order = min(j.order for j in self._jobs) - 1
+            else:
+                job.priority = min(j.priority for j in self._jobs)
+                job.order = next(self._order)
+            self._sort()
+            self._cond.notify()
+            return True
+
+    def bump(self, job_id, amount=1):
+        with self._cond:
+            job = next((j for j in self._jobs if j.id == job_id), None)
+            if job is None:
+                return False
+            job.priority += amount
+            self._sort()
+            self._cond.notify()
+            return True
+
+    def _ready_at(self, job, now):
+        ready_at = job.not_before
+        if self.cooldown:
+            ready_at = max(ready_at, now + self.cooldown.remaining(job.domain))
+        return ready_at
+
+    def get(self):
+        """Take the first job that is neither backing off nor on a cooling-down domain."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = None
+                for i, job in enumerate(self._jobs):
+                    ready_at = self._ready_at(job, now)
+                    if ready_at <= now:
+                        return self._jobs.pop(i)
+                    wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                self._cond.wait(wait)
+
+    def pending(self):
+        with self._cond:
+            return list(self._jobs)
+
+    def ready(self):
+        """Queued jobs that get() could hand out right now, in queue order."""
+        with self._cond:
+            now = time.monotonic()
+            return [job for job in self._jobs if self._ready_at(job, now) <= now]
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
@@ -3,7 +3,7 @@
 import sys
 import eel
 from app import App
-from world import check_ffmpeg, log_error, get_domain_from_url
+from world import check_ffmpeg, flush_error_log, log_error, get_domain_from_url
 
 app = None
 
@@ -14,17 +14,72 @@ def add_to_queue(url, audio_only):
         global app
         app.add_to_queue(url, audio_only)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="add_to_queue")
         eel.updateDownloadList(f"Error adding to queue: {e}")
 
 
+@eel.expose
+def cancel_job(job_id):
+    try:
+        global app
+        return app.cancel_job(int(job_id))
+    except Exception as e:
+        log_error(str(e), phase="ui", action="cancel_job", job_id=job_id)
+        eel.updateDownloadList(f"Error cancelling job: {e}")
+        return False
+
+
+@eel.expose
+def pause_job(job_id):
+    try:
+        global app
+        return app.pause_job(int(job_id))
+    except Exception as e:
+        log_error(str(e), phase="ui", action="pause_job", job_id=job_id)
+        eel.updateDownloadList(f"Error pausing job: {e}")
+        return False
+
+
+@eel.expose
+def resume_job(job_id):
+    try:
+        global app
+        return app.resume_job(int(job_id))
+    except Exception as e:
+        log_error(str(e), phase="ui", action="resume_job", job_id=job_id)
+        eel.updateDownloadList(f"Error resuming job: {e}")
+        return False
+
+
+@eel.expose
+def bump_job_priority(job_id):
+    try:
+        global app
+        return app.bump_job_priority(int(job_id))
+    except Exception as e:
+        log_error(str(e), phase="ui", action="bump_job_priority", job_id=job_id)
+        eel.updateDownloadList(f"Error changing job priority: {e}")
+        return False
+
+
+@eel.expose
+def move_job(job_id, position):
+    try:
+        global app
+        return app.move_job(int(job_id), position)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="move_job", job_id=job_id)
+        eel.updateDownloadList(f"Error moving job: {e}")
+        return False
+
+
 @eel.expose
 def browse_output(output_type):
     try:
         global app
         app.browse_output(output_type)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="browse_output")
         eel.updateDownloadList(f"Error browsing output: {e}")
 
 
@@ -40,7 +95,7 @@ def open_download_folder():
         global app
         app.open_download_folder()
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="open_download_folder")
         eel.updateDownloadList(f"Error opening download folder: {e}")
 
 
@@ -50,7 +105,7 @@ def open_logs_folder():
         global app
         app.open_logs_folder()
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="open_logs_folder")
         eel.updateDownloadList(f"Error opening logs folder: {e}")
 
 
@@ -60,7 +115,7 @@ def load_logs():
         global app
         app.load_logs()
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="load_logs")
         eel.updateDownloadList(f"Error loading logs: {e}")
 
 
@@ -70,7 +125,7 @@ def load_settings():
         global app
         return app.load_settings()
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="load_settings")
         eel.updateDownloadList(f"Error loading settings: {e}")
         return {}
 
@@ -82,7 +137,7 @@ def reset_settings():
         settings = app.reset_settings()
         return settings
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="reset_settings")
         eel.updateDownloadList(f"Error resetting settings: {e}")
         return {}
 
@@ -93,7 +148,7 @@ def set_video_quality(quality):
         global app
         app.set_video_quality(quality)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_video_quality")
         eel.updateDownloadList(f"Error setting video quality: {e}")
 
 
@@ -103,7 +158,7 @@ def set_video_format(video_format):
         global app
         app.set_video_format(video_format)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_video_format")
         eel.updateDownloadList(f"Error setting video format: {e}")
 
 
@@ -113,7 +168,7 @@ def set_video_output_path(path):
         global app
         app.set_video_output_path(path)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_video_output_path")
         eel.updateDownloadList(f"Error setting video output path: {e}")
 
 
@@ -123,7 +178,7 @@ def set_audio_format(audio_format):
         global app
         app.set_audio_format(audio_format)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_audio_format")
         eel.updateDownloadList(f"Error setting audio format: {e}")
 
 
@@ -133,7 +188,7 @@ def set_audio_output_path(path):
         global app
         app.set_audio_output_path(path)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_audio_output_path")
         eel.updateDownloadList(f"Error setting audio output path: {e}")
 
 
@@ -143,17 +198,37 @@ def set_proxy(proxy):
         global app
         app.set_proxy(proxy)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_proxy")
         eel.updateDownloadList(f"Error setting proxy: {e}")
 
 
+@eel.expose
+def set_proxy_affinity(proxy_affinity):
+    try:
+        global app
+        app.set_proxy_affinity(proxy_affinity)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="set_proxy_affinity")
+        eel.updateDownloadList(f"Error setting proxy affinity: {e}")
+
+
+@eel.expose
+def get_proxy_status():
+    try:
+        global app
+        return app.get_proxy_status()
+    except Exception as e:
+        log_error(str(e), phase="ui", action="get_proxy_status")
+        return []
+
+
 @eel.expose
 def set_sublangs(sublangs):
     try:
         global app
         app.set_sublangs(sublangs)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_sublangs")
         eel.updateDownloadList(f"Error setting subtitle languages: {e}")
 
 
@@ -163,7 +238,7 @@ def set_write_thumbnail(write_thumbnail):
         global app
         app.set_write_thumbnail(write_thumbnail)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_write_thumbnail")
         eel.updateDownloadList(f"Error setting write_thumbnail: {e}")
 
 
@@ -173,7 +248,7 @@ def set_embed_thumbnail(embed_thumbnail):
         global app
         app.set_embed_thumbnail(embed_thumbnail)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_embed_thumbnail")
         eel.updateDownloadList(f"Error setting embed_thumbnail: {e}")
 
 
@@ -183,7 +258,7 @@ def set_segments(segments):
         global app
         app.set_segments(segments)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_segments")
         eel.updateDownloadList(f"Error setting segments: {e}")
 
 
@@ -193,17 +268,77 @@ def set_retries(retries):
         global app
         app.set_retries(retries)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_retries")
         eel.updateDownloadList(f"Error setting retries: {e}")
 
 
+@eel.expose
+def set_concurrent_downloads(concurrent_downloads):
+    try:
+        global app
+        app.set_concurrent_downloads(concurrent_downloads)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="set_concurrent_downloads")
+        eel.updateDownloadList(f"Error setting concurrent downloads: {e}")
+
+
+@eel.expose
+def set_staging_path(path):
+    try:
+        global app
+        app.set_staging_path(path)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="set_staging_path")
+        eel.updateDownloadList(f"Error setting staging path: {e}")
+
+
+@eel.expose
+def set_cluster_store(path):
+    try:
+        global app
+        app.set_cluster_store(path)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="set_cluster_store")
+        eel.updateDownloadList(f"Error setting cluster store: {e}")
+
+
+@eel.expose
+def set_dedup_action(dedup_action):
+    try:
+        global app
+        app.set_dedup_action(dedup_action)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="set_dedup_action")
+        eel.updateDownloadList(f"Error setting duplicate handling: {e}")
+
+
+@eel.expose
+def delete_duplicate(path, original):
+    try:
+        global app
+        app.delete_duplicate(path, original)
+    except Exception as e:
+        log_error(str(e), phase="ui", action="delete_duplicate")
+        eel.updateDownloadList(f"Error deleting duplicate: {e}")
+
+
+@eel.expose
+def find_duplicates():
+    try:
+        global app
+        app.find_duplicates()
+    except Exception as e:
+        log_error(str(e), phase="ui", action="find_duplicates")
+        eel.updateDownloadList(f"Error finding duplicates: {e}")
+
+
 @eel.expose
 def set_buffer_size(buffer_size):
     try:
         global app
         app.set_buffer_size(buffer_size)
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="set_buffer_size")
         eel.updateDownloadList(f"Error setting buffer size: {e}")
 
 
@@ -224,7 +359,7 @@ def save_cookie(url, content):
         result = app.auth_manager.save_cookies(domain, content)
         return result
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="save_cookie")
         return False
 
 @eel.expose
@@ -237,7 +372,7 @@ def save_credentials(url, username, password):
         result = app.auth_manager.save_credentials(domain, username, password)
         return result
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="save_credentials")
         return False
 
 @eel.expose
@@ -246,7 +381,7 @@ def list_auth_entries():
         entries = app.auth_manager.list_auth_entries()
         return entries
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="list_auth_entries")
         return []
 
 @eel.expose
@@ -255,12 +390,13 @@ def delete_auth_entry(domain, auth_type):
         result = app.auth_manager.delete_auth(domain, auth_type)
         return result
     except Exception as e:
-        log_error(str(e))
+        log_error(str(e), phase="ui", action="delete_auth_entry")
         return False
 
 
 def on_close(page, sockets):
     print("Closing application...")
+    flush_error_log()
     sys.exit()
 
 
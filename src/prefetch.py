@@ -0,0 +1,63 @@
+# prefetch.py
+
+import threading
+
+from world import log_error
+
+# Seconds between looks at the queue while nothing is ready to prefetch
+RECHECK_INTERVAL = 5.0
+
+
+class Prefetcher:
+    """Resolves metadata for the next few queued jobs while earlier jobs are downloading."""
+
+    def __init__(self, job_queue, resolver, on_resolved=None, lookahead=3, workers=2, ttl=300):
+        self.job_queue = job_queue
+        self.resolver = resolver
+        self.on_resolved = on_resolved
+        self.lookahead = lookahead
+        self.ttl = ttl
+        self._inflight = set()
+        self._cond = threading.Condition()
+        for _ in range(workers):
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _next_job(self):
+        # Jobs backing off or on a cooling-down domain are skipped, so prefetch never hits a domain early
+        for job in self.job_queue.ready()[:self.lookahead]:
+            if job.id in self._inflight or job.prefetch_failed or job.status != "queued":
+                continue
+            if not job.has_fresh_info():
+                # Signed media URLs expire, so stale results are dropped and resolved again
+                job.info = None
+                return job
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    # Nobody is notified when a backoff or cooldown runs out, so check again soon
+                    self._cond.wait(timeout=min(self.ttl / 2, RECHECK_INTERVAL))
+                    job = self._next_job()
+                self._inflight.add(job.id)
+
+            try:
+                info = self.resolver(job)
+                if info:
+                    job.set_prefetched(info, self.ttl)
+                    if self.on_resolved:
+                        self.on_resolved(job)
+                else:
+                    job.prefetch_failed = True
+            except Exception as e:
+                job.prefetch_failed = True
+                log_error(f"Prefetch failed for '{job.url}': {str(e)}", job_id=job.id, domain=job.domain, phase="prefetch")
+            finally:
+                with self._cond:
+                    self._inflight.discard(job.id)
@@ -0,0 +1,203 @@
+# proxy.py
+
+import re
+import socket
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+# Used to turn throughput into an expected transfer time when scoring
+REFERENCE_BYTES = 50 * 1024 * 1024
+DEFAULT_LATENCY = 1.0
+DEFAULT_THROUGHPUT = 1024 * 1024
+
+# Weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.3
+
+
+def parse_proxies(text):
+    """Split a comma, semicolon or whitespace separated proxy list."""
+    if not text:
+        return []
+    return [p for p in re.split(r'[\s,;]+', text.strip()) if p]
+
+
+def parse_affinity(text):
+    """Parse 'domain=proxy1|proxy2; other.com=proxy3' into {domain: [proxies]}."""
+    affinity = {}
+    if not text:
+        return affinity
+    for rule in re.split(r'[;\n]+', text):
+        if '=' not in rule:
+            continue
+        domain, proxies = rule.split('=', 1)
+        domain = domain.strip().lower()
+        proxies = [p.strip() for p in proxies.split('|') if p.strip()]
+        if domain and proxies:
+            affinity[domain] = proxies
+    return affinity
+
+
+def _ewma(current, sample):
+    return sample if current is None else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+
+class ProxyState:
+    def __init__(self, url):
+        self.url = url
+        self.latency = None  # seconds
+        self.throughput = None  # bytes per second
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.active = 0
+
+    def is_available(self, now):
+        return now >= self.ejected_until
+
+    def score(self):
+        """Expected seconds to move a reference-sized job through this proxy, lower is better."""
+        latency = self.latency if self.latency is not None else DEFAULT_LATENCY
+        throughput = self.throughput or DEFAULT_THROUGHPUT
+        return (latency + REFERENCE_BYTES / throughput) * (1 + self.active)
+
+    def to_dict(self, now):
+        return {
+            "url": self.url,
+            "healthy": self.is_available(now),
+            "latency": self.latency,
+            "throughput": self.throughput,
+            "failures": self.failures,
+            "active": self.active,
+        }
+
+
+class ProxyPool:
+    """Assigns jobs to the best available proxy and keeps proxy health up to date."""
+
+    def __init__(self, probe_url='https://www.gstatic.com/generate_204', probe_interval=60, probe_timeout=10,
+                 max_failures=3, eject_seconds=300, on_event=None):
+        self.probe_url = probe_url
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.on_event = on_event
+        self.proxies = {}
+        self.affinity = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._probe_loop, daemon=True).start()
+
+    def set_proxies(self, urls):
+        with self._lock:
+            # Keep the measurements of proxies that are still configured
+            self.proxies = {url: self.proxies.get(url) or ProxyState(url) for url in urls}
+        self._wake.set()
+
+    def set_affinity(self, affinity):
+        with self._lock:
+            self.affinity = dict(affinity)
+
+    def _affinity_for(self, domain):
+        # Rules for a parent domain also apply to its subdomains
+        parts = (domain or '').split('.')
+        for i in range(len(parts)):
+            rule = self.affinity.get('.'.join(parts[i:]))
+            if rule:
+                return [self.proxies[url] for url in rule if url in self.proxies]
+        return []
+
+    def acquire(self, domain, prefer=None):
+        """Pick a proxy for a job on the given domain, or None if no proxies are configured.
+
+        prefer is used as long as it is still configured and healthy.
+        """
+        with self._lock:
+            if not self.proxies:
+                return None
+            now = time.monotonic()
+            preferred = self.proxies.get(prefer)
+            if preferred is not None and preferred.is_available(now):
+                preferred.active += 1
+                return preferred.url
+            candidates = [p for p in self._affinity_for(domain) if p.is_available(now)]
+            if not candidates:
+                candidates = [p for p in self.proxies.values() if p.is_available(now)]
+            if candidates:
+                best = min(candidates, key=ProxyState.score)
+            else:
+                # Everything is ejected, fall back to the one closest to re-admission
+                best = min(self.proxies.values(), key=lambda p: p.ejected_until)
+            best.active += 1
+            return best.url
+
+    def release(self, url, success, nbytes=0, seconds=0.0):
+        """Report the outcome of a job that ran through the proxy."""
+        if url is None:
+            return
+        with self._lock:
+            proxy = self.proxies.get(url)
+            if proxy is None:
+                return
+            proxy.active = max(proxy.active - 1, 0)
+            if success:
+                if nbytes and seconds > 0:
+                    proxy.throughput = _ewma(proxy.throughput, nbytes / seconds)
+                proxy.failures = 0
+            else:
+                self._record_failure(proxy)
+
+    def _record_failure(self, proxy):
+        proxy.failures += 1
+        if proxy.failures >= self.max_failures and proxy.is_available(time.monotonic()):
+            proxy.ejected_until = time.monotonic() + self.eject_seconds
+            self._emit(f"Proxy ejected after {proxy.failures} failures: {proxy.url}")
+
+    def _emit(self, message):
+        if self.on_event:
+            self.on_event(message)
+
+    def probe(self, url):
+        """Measure the round trip through a proxy. Raises on failure."""
+        start = time.monotonic()
+        scheme = urlparse(url).scheme.lower()
+        if scheme.startswith('socks'):
+            # urllib cannot speak SOCKS, so only check that the proxy accepts connections
+            parsed = urlparse(url)
+            with socket.create_connection((parsed.hostname, parsed.port or 1080), timeout=self.probe_timeout):
+                pass
+        else:
+            opener = urllib.request.build_opener(urllib.request.ProxyHandler({'http': url, 'https': url}))
+            with opener.open(self.probe_url, timeout=self.probe_timeout) as response:
+                response.read(1024)
+        return time.monotonic() - start
+
+    def probe_all(self):
+        with self._lock:
+            proxies = list(self.proxies.values())
+        for proxy in proxies:
+            try:
+                latency = self.probe(proxy.url)
+            except Exception:
+                with self._lock:
+                    self._record_failure(proxy)
+                continue
+            with self._lock:
+                proxy.latency = _ewma(proxy.latency, latency)
+                if not proxy.is_available(time.monotonic()):
+                    proxy.ejected_until = 0.0
+                    self._emit(f"Proxy re-admitted: {proxy.url}")
+                proxy.failures = 0
+
+    def _probe_loop(self):
+        while True:
+            self._wake.wait(self.probe_interval)
+            self._wake.clear()
+            if self.proxies:
+                self.probe_all()
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            return [p.to_dict(now) for p in self.proxies.values()]
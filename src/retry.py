@@ -0,0 +1,121 @@
+# retry.py
+
+import errno
+import random
+import re
+import socket
+import threading
+import time
+
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError, ExtractorError, GeoRestrictedError, PostProcessingError
+
+# Error classes
+NETWORK = "network"
+RATE_LIMITED = "rate_limited"
+FORBIDDEN = "forbidden"
+GEO_AUTH = "geo_auth"
+UNAVAILABLE = "unavailable"
+POSTPROCESS = "postprocess"
+NO_SPACE = "no_space"
+UNKNOWN = "unknown"
+
+# Worth another attempt later, everything else fails fast
+TRANSIENT = {NETWORK, RATE_LIMITED, FORBIDDEN, NO_SPACE, UNKNOWN}
+
+# Fallback patterns for errors that only survive as a message
+MESSAGE_PATTERNS = [
+    (NO_SPACE, re.compile(r'No space left on device|Not enough disk space|Disk quota exceeded', re.I)),
+    (RATE_LIMITED, re.compile(r'HTTP Error 429|Too Many Requests|rate.?limit', re.I)),
+    (FORBIDDEN, re.compile(r'HTTP Error 403|Forbidden', re.I)),
+    # Status codes go before the word-based patterns, "HTTP Error 503: Service Unavailable" is a network error
+    (NETWORK, re.compile(r'HTTP Error 5\d\d', re.I)),
+    (GEO_AUTH, re.compile(r'geo.?restrict|not available in your country|sign in|log ?in|'
+                          r'members.only|private video|cookies|authenticat', re.I)),
+    (UNAVAILABLE, re.compile(r'unavailable|has been removed|does not exist|HTTP Error 404|HTTP Error 410|'
+                             r'Unsupported URL|is not a valid URL|no video formats|Requested format is not available',
+                             re.I)),
+    (POSTPROCESS, re.compile(r'postprocess|ffmpeg|ffprobe|Conversion failed', re.I)),
+    (NETWORK, re.compile(r'timed? ?out|Connection (reset|refused|aborted)|Temporary failure|'
+                         r'Name or service not known|Network is unreachable|Remote end closed|'
+                         r'IncompleteRead|HTTP Error 5\d\d|Unable to download', re.I)),
+]
+
+
+def _error_chain(error):
+    """Yield the exception and everything it wraps."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        if isinstance(error, DownloadError) and error.exc_info:
+            error = error.exc_info[1]
+        elif isinstance(error, ExtractorError) and error.cause is not None:
+            error = error.cause
+        else:
+            error = error.__cause__ or error.__context__
+
+
+def classify_error(error) -> str:
+    """Classify an exception (or error message) into one of the error classes above."""
+    if isinstance(error, BaseException):
+        for exc in _error_chain(error):
+            if isinstance(exc, HTTPError):
+                if exc.status == 429:
+                    return RATE_LIMITED
+                if exc.status == 403:
+                    return FORBIDDEN
+                if exc.status in (404, 410):
+                    return UNAVAILABLE
+                if exc.status >= 500:
+                    return NETWORK
+            if isinstance(exc, GeoRestrictedError):
+                return GEO_AUTH
+            if isinstance(exc, PostProcessingError):
+                return POSTPROCESS
+            if isinstance(exc, OSError) and exc.errno in (errno.ENOSPC, getattr(errno, 'EDQUOT', None)):
+                return NO_SPACE
+            if isinstance(exc, (TransportError, socket.timeout, TimeoutError, ConnectionError)):
+                return NETWORK
+        message = str(error)
+    else:
+        message = str(error or '')
+
+    for error_class, pattern in MESSAGE_PATTERNS:
+        if pattern.search(message):
+            return error_class
+    return UNKNOWN
+
+
+def is_transient(error_class: str) -> bool:
+    return error_class in TRANSIENT
+
+
+def backoff_delay(attempt: int, base: float = 5.0, cap: float = 600.0) -> float:
+    """Exponential backoff with jitter for the given attempt number (1-based)."""
+    delay = min(cap, base * (2 ** max(attempt - 1, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class DomainCooldown:
+    """Tracks domains that must not be contacted until a cooldown expires."""
+
+    def __init__(self):
+        self._until = {}
+        self._lock = threading.Lock()
+
+    def trigger(self, domain, seconds):
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._until[domain] = max(self._until.get(domain, 0.0), until)
+
+    def remaining(self, domain):
+        with self._lock:
+            until = self._until.get(domain)
+            if until is None:
+                return 0.0
+            remaining = until - time.monotonic()
+            if remaining <= 0:
+                del self._until[domain]
+                return 0.0
+            return remaining
@@ -0,0 +1,143 @@
+# storage.py
+
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Free space that is never handed out to downloads
+DEFAULT_MARGIN = 512 * 1024 * 1024
+
+# Only resize placeholder files once this much has been downloaded since the last resize
+SHRINK_STEP = 64 * 1024 * 1024
+
+RESERVE_SUFFIX = '.o2reserve'
+
+
+class InsufficientSpaceError(Exception):
+    pass
+
+
+class Reservation:
+    """Space held for one job on one filesystem, released as the job writes its own data."""
+
+    def __init__(self, budget, device, nbytes, placeholder=None):
+        self.budget = budget
+        self.device = device
+        self.nbytes = nbytes
+        self.placeholder = placeholder
+        self._placeholder_size = nbytes if placeholder else 0
+
+    def update(self, downloaded):
+        """Shrink the reservation to what the job still has to write."""
+        remaining = max(self.nbytes - downloaded, 0)
+        if self.placeholder and self._placeholder_size - remaining >= SHRINK_STEP:
+            try:
+                os.truncate(self.placeholder, remaining)
+                self._placeholder_size = remaining
+            except OSError:
+                pass
+        # Space still held by the placeholder already shows up as used on disk
+        self.budget.adjust(self, max(remaining - self._placeholder_size, 0))
+
+    def release(self):
+        self.budget.forget(self)
+        if self.placeholder:
+            try:
+                os.remove(self.placeholder)
+            except OSError:
+                pass
+            self.placeholder = None
+
+
+class DiskBudget:
+    """Tracks space reserved by concurrent jobs on each filesystem."""
+
+    def __init__(self, margin=DEFAULT_MARGIN):
+        self.margin = margin
+        self._reserved = {}  # st_dev -> bytes
+        self._held = {}  # id(reservation) -> bytes
+        self._lock = threading.Lock()
+
+    def reserve(self, path, nbytes, preallocate=False):
+        """Reserve nbytes in the filesystem holding path, or raise InsufficientSpaceError."""
+        os.makedirs(path, exist_ok=True)
+        device = os.stat(path).st_dev
+        with self._lock:
+            free = shutil.disk_usage(path).free
+            available = free - self._reserved.get(device, 0) - self.margin
+            if nbytes > available:
+                raise InsufficientSpaceError(
+                    f"Not enough disk space in {path}: need {nbytes} bytes, {max(available, 0)} available")
+            placeholder = os.path.join(path, RESERVE_SUFFIX) if preallocate and nbytes else None
+            reservation = Reservation(self, device, nbytes, placeholder)
+            self._reserved[device] = self._reserved.get(device, 0) + nbytes
+            self._held[id(reservation)] = nbytes
+
+        if placeholder:
+            # Claim the blocks up front so other processes cannot take them mid-download
+            try:
+                with open(placeholder, 'wb') as f:
+                    if hasattr(os, 'posix_fallocate'):
+                        os.posix_fallocate(f.fileno(), 0, nbytes)
+                    else:
+                        f.truncate(nbytes)
+            except OSError:
+                reservation.release()
+                raise InsufficientSpaceError(f"Could not preallocate {nbytes} bytes in {path}")
+            self.adjust(reservation, 0)
+        return reservation
+
+    def adjust(self, reservation, nbytes):
+        with self._lock:
+            held = self._held.get(id(reservation))
+            if held is None:
+                return
+            self._reserved[reservation.device] = max(self._reserved.get(reservation.device, 0) - held + nbytes, 0)
+            self._held[id(reservation)] = nbytes
+
+    def forget(self, reservation):
+        self.adjust(reservation, 0)
+        with self._lock:
+            self._held.pop(id(reservation), None)
+
+
+class Mover:
+    """Moves finished files from the staging directory to their destination in the background."""
+
+    def __init__(self, workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mover')
+
+    def move(self, src_dir, dest_dir, on_done=None):
+        future = self._executor.submit(self._move_all, src_dir, dest_dir)
+        if on_done:
+            future.add_done_callback(on_done)
+        return future
+
+    @staticmethod
+    def _move_all(src_dir, dest_dir):
+        """Move every finished file, renaming instead of overwriting. Returns (moved, renamed)."""
+        os.makedirs(dest_dir, exist_ok=True)
+        moved = []
+        renamed = []
+        for name in os.listdir(src_dir):
+            if name.endswith('.part') or name.endswith('.ytdl') or name == RESERVE_SUFFIX:
+                continue
+            dest = free_path(os.path.join(dest_dir, name))
+            shutil.move(os.path.join(src_dir, name), dest)
+            moved.append(dest)
+            if os.path.basename(dest) != name:
+                renamed.append((name, os.path.basename(dest)))
+        shutil.rmtree(src_dir, ignore_errors=True)
+        return moved, renamed
+
+
+def free_path(path):
+    """Return path, or 'name (n).ext' with the first n that does not exist yet."""
+    if not os.path.exists(path):
+        return path
+    base, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists(f"{base} ({n}){ext}"):
+        n += 1
+    return f"{base} ({n}){ext}"
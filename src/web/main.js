@@ -7,6 +7,11 @@ eel.expose(setProgressBar);
 eel.expose(updateLogsTable);
 eel.expose(setSettingsFromFile);
 eel.expose(clearLogsTable);
+eel.expose(updateQueueItem);
+eel.expose(removeQueueItem);
+eel.expose(setQueueOrder);
+eel.expose(setQueueEta);
+eel.expose(confirmDuplicateDelete);
 
 eel.expose(set_browse_output);
 function set_browse_output(outputType, path) {
@@ -21,10 +26,19 @@ function set_browse_output(outputType, path) {
 
 let isDownloading = false;
 
+// Keep the console bounded during long sessions
+const MAX_CONSOLE_LINES = 1000;
+const MAX_LOG_ROWS = 500;
+let consoleLines = [];
+
 // Append message to download list
 function appendToDownloadList(message) {
     const downloadList = document.getElementById('console');
-    downloadList.value += message + '\n';
+    consoleLines.push(message);
+    if (consoleLines.length > MAX_CONSOLE_LINES) {
+        consoleLines = consoleLines.slice(-MAX_CONSOLE_LINES);
+    }
+    downloadList.value = consoleLines.join('\n') + '\n';
     downloadList.scrollTop = downloadList.scrollHeight;
 }
 
@@ -42,13 +56,139 @@ function updateLogsTable(logEntry) {
     const logsTableBody = document.getElementById('logs-table').querySelector('tbody');
     const row = document.createElement('tr');
     row.classList.add(logEntry.result === 'Success' ? 'good' : 'bad');
-    row.innerHTML = `
-        <td>${logEntry.result}</td>
-        <td>${logEntry.date}</td>
-        <td>${logEntry.url}</td>
-        <td>${logEntry.folder}</td>
-    `;
+    [logEntry.result, logEntry.date, logEntry.url, logEntry.folder].forEach(value => {
+        row.appendChild(createCell(value));
+    });
     logsTableBody.appendChild(row);
+    while (logsTableBody.rows.length > MAX_LOG_ROWS) {
+        logsTableBody.deleteRow(0);
+    }
+}
+
+function createCell(text) {
+    const cell = document.createElement('td');
+    cell.textContent = text;
+    return cell;
+}
+
+function formatSize(bytes) {
+    if (!bytes) {
+        return '-';
+    }
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let size = bytes;
+    let unit = 0;
+    while (size >= 1024 && unit < units.length - 1) {
+        size /= 1024;
+        unit++;
+    }
+    return `${size.toFixed(1)} ${units[unit]}`;
+}
+
+function updateQueueItem(job) {
+    const queueTableBody = document.getElementById('queue-table').querySelector('tbody');
+    let row = document.getElementById(`queue-item-${job.id}`);
+    if (!row) {
+        row = document.createElement('tr');
+        row.id = `queue-item-${job.id}`;
+        queueTableBody.appendChild(row);
+    }
+    const pauseAction = job.status === 'paused' ? 'resume' : 'pause';
+    // Titles come from remote metadata, so every value goes in as text, never as HTML
+    row.replaceChildren(
+        createCell(job.id),
+        createCell(job.title || job.url),
+        createCell(formatSize(job.filesize)),
+        createCell(job.status)
+    );
+    const actions = document.createElement('td');
+    [
+        [pauseAction, pauseAction === 'pause' ? 'Pause' : 'Resume'],
+        ['cancel', 'Cancel'],
+        ['front', 'Top'],
+        ['back', 'Bottom'],
+        ['bump', 'Priority +']
+    ].forEach(([action, label]) => {
+        const btn = document.createElement('button');
+        btn.className = 'queue-action-btn';
+        btn.dataset.action = action;
+        btn.dataset.job = job.id;
+        btn.textContent = label;
+        actions.appendChild(btn);
+    });
+    row.appendChild(actions);
+}
+
+function formatDuration(seconds) {
+    const total = Math.round(seconds);
+    const hours = Math.floor(total / 3600);
+    const minutes = Math.floor((total % 3600) / 60);
+    const secs = total % 60;
+    if (hours > 0) {
+        return `${hours}h ${minutes}m`;
+    }
+    if (minutes > 0) {
+        return `${minutes}m ${secs}s`;
+    }
+    return `${secs}s`;
+}
+
+function setQueueEta(seconds, remainingJobs) {
+    const queueEta = document.getElementById('queue-eta');
+    if (!remainingJobs) {
+        queueEta.textContent = 'Queue: idle';
+        return;
+    }
+    const finishAt = new Date(Date.now() + seconds * 1000).toLocaleTimeString();
+    queueEta.textContent = `Queue: ${remainingJobs} job(s), about ${formatDuration(seconds)} left (done around ${finishAt})`;
+}
+
+function setQueueOrder(jobIds) {
+    const queueTableBody = document.getElementById('queue-table').querySelector('tbody');
+    jobIds.forEach(jobId => {
+        const row = document.getElementById(`queue-item-${jobId}`);
+        if (row) {
+            queueTableBody.appendChild(row);
+        }
+    });
+}
+
+// Job control buttons in the queue table
+document.getElementById('queue-table').addEventListener('click', (event) => {
+    const btn = event.target.closest('.queue-action-btn');
+    if (!btn) {
+        return;
+    }
+    const jobId = parseInt(btn.getAttribute('data-job'));
+    switch (btn.getAttribute('data-action')) {
+        case 'pause':
+            eel.pause_job(jobId);
+            break;
+        case 'resume':
+            eel.resume_job(jobId);
+            break;
+        case 'cancel':
+            if (confirm('Are you sure you want to cancel this download?')) {
+                eel.cancel_job(jobId);
+            }
+            break;
+        case 'front':
+            eel.move_job(jobId, 'front');
+            break;
+        case 'back':
+            eel.move_job(jobId, 'back');
+            break;
+        case 'bump':
+            eel.bump_job_priority(jobId);
+            break;
+    }
+});
+
+function removeQueueItem(jobId) {
+    const row = document.getElementById(`queue-item-${jobId}`);
+    if (row) {
+        row.remove();
+    }
 }
 
 function clearLogsTable() {
@@ -70,9 +210,14 @@ function setSettingsFromFile(settings) {
     document.getElementById('segments').value = settings.segments || 4;
     document.getElementById('retries').value = settings.retries || 5;
     document.getElementById('buffer-size').value = settings.buffer_size || '16M';
+    document.getElementById('concurrent-downloads').value = settings.concurrent_downloads || 1;
+    document.getElementById('staging-path').value = settings.staging_path || '';
+    document.getElementById('cluster-store').value = settings.cluster_store || '';
+    document.getElementById('dedup-action-select').value = settings.dedup_action || 'keep';
 
     // Other Settings
     document.getElementById('proxy-input').value = settings.proxy || '';
+    document.getElementById('proxy-affinity-input').value = settings.proxy_affinity || '';
     document.getElementById('sublangs-input').value = settings.sublangs || '';
     document.getElementById('write-thumbnail-checkbox').checked = settings.write_thumbnail || false;
     document.getElementById('embed-thumbnail-checkbox').checked = settings.embed_thumbnail || false;
@@ -132,11 +277,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
 // Download Button Logic
 document.getElementById('download-btn').addEventListener('click', () => {
-    if (isDownloading) {
-        alert('A download is already in progress.');
-        return;
-    }
-
     const url = document.getElementById('url-input').value.trim();
     const quality = document.getElementById('quality-select').value;
     const audioOnly = document.getElementById('audio-checkbox').checked;
@@ -154,9 +294,6 @@ document.getElementById('download-btn').addEventListener('click', () => {
     const bufferSizeRegex = /^\d+[KMG]?$/i;
     const validBufferSize = bufferSizeRegex.test(bufferSize) ? bufferSize : '1M';
 
-    isDownloading = true;
-    toggleDownloadButtons(true);
-
     // Pass quality and additional settings to backend via settings
     eel.set_video_quality(quality);
     eel.set_segments(segments);
@@ -164,7 +301,7 @@ document.getElementById('download-btn').addEventListener('click', () => {
     eel.set_buffer_size(validBufferSize);
 
     eel.add_to_queue(url, audioOnly);
-    appendToDownloadList('Download started...');
+    appendToDownloadList('Added to download queue...');
     document.getElementById('url-input').value = '';
 });
 
@@ -180,6 +317,7 @@ document.getElementById('audio-browse-btn').addEventListener('click', () => {
 
 // Clear Console
 document.getElementById('clear-console-btn').addEventListener('click', () => {
+    consoleLines = [];
     document.getElementById('console').value = '';
 });
 
@@ -188,6 +326,39 @@ document.getElementById('open-folder-btn').addEventListener('click', () => {
     eel.open_download_folder();
 });
 
+// Find Duplicates
+document.getElementById('find-duplicates-btn').addEventListener('click', () => {
+    if (document.getElementById('dedup-action-select').value === 'delete' &&
+        !confirm('Delete the newer copy of every duplicate in the output folders?')) {
+        return;
+    }
+    eel.find_duplicates();
+});
+
+// Proxy Status
+document.getElementById('proxy-status-btn').addEventListener('click', () => {
+    eel.get_proxy_status()((proxies) => {
+        if (!proxies.length) {
+            appendToDownloadList('No proxies configured.');
+            return;
+        }
+        proxies.forEach(proxy => {
+            const latency = proxy.latency === null ? '-' : `${Math.round(proxy.latency * 1000)} ms`;
+            const throughput = proxy.throughput ? `${formatSize(proxy.throughput)}/s` : '-';
+            appendToDownloadList(
+                `Proxy ${proxy.url}: ${proxy.healthy ? 'healthy' : 'ejected'}, latency ${latency}, ` +
+                `throughput ${throughput}, ${proxy.failures} failure(s), ${proxy.active} active`);
+        });
+    });
+});
+
+// Asked for each finished download that duplicates an existing file when Duplicates is set to delete
+function confirmDuplicateDelete(duplicate) {
+    if (confirm(`${duplicate.path} (${formatSize(duplicate.size)}) is a copy of ${duplicate.original}.\n\nDelete the new copy?`)) {
+        eel.delete_duplicate(duplicate.path, duplicate.original);
+    }
+}
+
 // Open Logs Folder
 document.getElementById('open-logs-btn').addEventListener('click', () => {
     eel.open_logs_folder();
@@ -226,6 +397,11 @@ document.getElementById('proxy-input').addEventListener('change', () => {
     eel.set_proxy(proxy);
 });
 
+document.getElementById('proxy-affinity-input').addEventListener('change', () => {
+    const proxyAffinity = document.getElementById('proxy-affinity-input').value;
+    eel.set_proxy_affinity(proxyAffinity);
+});
+
 document.getElementById('sublangs-input').addEventListener('change', () => {
     const sublangs = document.getElementById('sublangs-input').value;
     eel.set_sublangs(sublangs);
@@ -272,6 +448,30 @@ document.getElementById('buffer-size').addEventListener('change', () => {
     eel.set_buffer_size(bufferSize);
 });
 
+document.getElementById('concurrent-downloads').addEventListener('change', () => {
+    let concurrentDownloads = parseInt(document.getElementById('concurrent-downloads').value);
+    if (isNaN(concurrentDownloads) || concurrentDownloads < 1 || concurrentDownloads > 8) {
+        alert('Concurrent downloads must be a number between 1 and 8.');
+        document.getElementById('concurrent-downloads').value = '1';
+        concurrentDownloads = 1;
+    }
+    eel.set_concurrent_downloads(concurrentDownloads);
+});
+
+document.getElementById('staging-path').addEventListener('change', () => {
+    const path = document.getElementById('staging-path').value.trim();
+    eel.set_staging_path(path);
+});
+
+document.getElementById('dedup-action-select').addEventListener('change', () => {
+    eel.set_dedup_action(document.getElementById('dedup-action-select').value);
+});
+
+document.getElementById('cluster-store').addEventListener('change', () => {
+    const path = document.getElementById('cluster-store').value.trim();
+    eel.set_cluster_store(path);
+});
+
 // Function to toggle download buttons
 function toggleDownloadButtons(downloading) {
     document.getElementById('download-btn').disabled = downloading;
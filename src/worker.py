@@ -0,0 +1,38 @@
+# worker.py
+
+import argparse
+import os
+import socket
+
+from cluster import ClusterWorker, FileJobStore
+from world import check_ffmpeg, get_default_output_path, set_error_log_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an Oxygen2 download worker against a shared job store.")
+    parser.add_argument('--store', required=True, help="Job store folder shared with the coordinator")
+    parser.add_argument('--output', default=None, help="Video output folder for this worker")
+    parser.add_argument('--audio-output', default=None, help="Audio output folder for this worker")
+    parser.add_argument('--rate-limit', default=None, help="Bandwidth share for this worker, e.g. 5M")
+    parser.add_argument('--worker-id', default=None, help="Name reported with results, defaults to host-pid")
+    parser.add_argument('--lease', type=int, default=60, help="Seconds before a silent worker's job is reclaimed")
+    args = parser.parse_args()
+
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    # Workers on one machine share its config folder, each keeps and rotates an error log of its own
+    set_error_log_name(f"O2-error-{worker_id}.jsonl")
+    check_ffmpeg()
+    worker = ClusterWorker(
+        FileJobStore(args.store),
+        args.output or get_default_output_path(for_audio=False),
+        args.audio_output or args.output or get_default_output_path(for_audio=True),
+        worker_id=worker_id,
+        rate_limit=args.rate_limit,
+        lease_seconds=args.lease
+    )
+    print(f"Worker {worker.worker_id} waiting for jobs in {args.store}")
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
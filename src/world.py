@@ -1,21 +1,52 @@
 # world.py
-import datetime
-import json
+import atexit
 import os
 import subprocess
 import sys
+import threading
 from pathlib import Path
-from datetime import datetime
 from urllib.parse import urlparse
 
+from errorlog import ErrorLog
 
-def log_error(error_message: str):
-    error_dir = get_config_path() / "error"
-    error_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-    error_filename = error_dir / f"O2-error-{timestamp}.log"
-    with open(error_filename, 'w', encoding='utf-8') as f:
-        json.dump({"error": error_message, "timestamp": timestamp}, f, ensure_ascii=False, indent=4)
+_error_log = None
+_error_log_lock = threading.Lock()
+# Every process rotates its own file, processes sharing a config folder need different names
+_error_log_name = "O2-error.jsonl"
+
+
+def get_error_log():
+    """The process-wide error log, started on first use and flushed at exit."""
+    global _error_log
+    with _error_log_lock:
+        if _error_log is None:
+            _error_log = ErrorLog(get_config_path() / "error", filename=_error_log_name)
+            atexit.register(_error_log.flush)
+    return _error_log
+
+
+def set_error_log_name(name):
+    """Name this process's error log file, before anything is logged."""
+    global _error_log_name
+    with _error_log_lock:
+        if _error_log is not None:
+            raise RuntimeError("The error log is already open")
+        _error_log_name = name
+
+
+def log_error(error_message: str, exc: BaseException = None, **fields):
+    """Queue an error record. fields such as job_id, domain and phase are stored with it.
+
+    The traceback is taken from exc, or from the exception being handled when called in an except block.
+    """
+    if exc is None:
+        exc = sys.exc_info()[1]
+    get_error_log().log(error_message, exc, **fields)
+
+
+def flush_error_log(timeout=5.0):
+    if _error_log is not None:
+        _error_log.flush(timeout)
 
 
 def resource_path(relative_path):
@@ -52,7 +83,8 @@ def check_ffmpeg():
         subprocess.run(["ffmpeg", "-version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
     except (subprocess.CalledProcessError, FileNotFoundError):
         log_error(
-            "FFmpeg is not installed or not in the system PATH. Please install FFmpeg and add it to your system PATH.")
+            "FFmpeg is not installed or not in the system PATH. Please install FFmpeg and add it to your system PATH.",
+            phase="startup")
         print(
             "FFmpeg is not installed or not in the system PATH. Please install FFmpeg and add it to your system PATH.")
         sys.exit(1)
@@ -78,5 +110,5 @@ def get_domain_from_url(url):
 
         return domain.strip().lower()
     except Exception as e:
-        log_error(f"Error parsing domain from URL '{url}': {str(e)}")
+        log_error(f"Error parsing domain from URL '{url}': {str(e)}", phase="parse_url")
         return ''